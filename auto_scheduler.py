@@ -2,10 +2,11 @@
 Agendador único para relatórios diário, semanal e mensal automáticos.
 """
 import schedule
-import time
+import signal
+import threading
 import logging
 from datetime import datetime, timedelta
-from main import load_config, collect_hosts, generate_comparison_report
+from main import load_config, reload_config, collect_hosts, generate_comparison_report
 from database import DatabaseManager
 from comparator import HostComparator
 from report_generator import ReportGenerator
@@ -26,34 +27,80 @@ class APMJsonFormatter(logging.Formatter):
             log_record["exception"] = self.formatException(record.exc_info)
         return json.dumps(log_record)
 
+# Tabela de acentos usados nas mensagens; demais caracteres caem no normalize
+_ACENTOS = str.maketrans(
+    'áàâãäéèêëíìîïóòôõöúùûüçÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇ',
+    'aaaaaeeeeiiiiooooouuuucAAAAAEEEEIIIIOOOOOUUUUC'
+)
+
 def remove_acentos(text):
-    if not isinstance(text, str):
+    if not isinstance(text, str) or text.isascii():
+        return text
+    text = text.translate(_ACENTOS)
+    if text.isascii():
         return text
     return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('ASCII')
 
-class APMJsonFormatterNoAcento(APMJsonFormatter):
-    def format(self, record):
-        if hasattr(record, 'msg') and isinstance(record.msg, str):
+# Remove acentos uma única vez por registro, mesmo com vários handlers
+class StripAccentsFilter(logging.Filter):
+    def filter(self, record):
+        if isinstance(record.msg, str) and not getattr(record, '_acentos_removidos', False):
             record.msg = remove_acentos(record.msg)
-        return super().format(record)
+            record._acentos_removidos = True
+        return True
+
+formatter = APMJsonFormatter()
+strip_accents = StripAccentsFilter()
 
 handler = logging.StreamHandler()
-handler.setFormatter(APMJsonFormatterNoAcento())
+handler.setFormatter(formatter)
+handler.addFilter(strip_accents)
 
 file_handler = logging.FileHandler('zabbix_scheduler.log')
-file_handler.setFormatter(APMJsonFormatterNoAcento())
+file_handler.setFormatter(formatter)
+file_handler.addFilter(strip_accents)
 
 logger = logging.getLogger()
 logger.handlers = [handler, file_handler]
 logger.setLevel(logging.INFO)
 
+# Sinaliza o encerramento do loop principal (SIGTERM/Ctrl+C)
+shutdown_event = threading.Event()
+
+# Limite de espera entre verificações, em segundos
+MAX_IDLE_SECONDS = 3600
+
+# Remetente compartilhado entre os jobs para reaproveitar a sessão SMTP,
+# e a configuração com que foi criado
+_email_sender = None
+_email_sender_config = None
+_email_sender_lock = threading.Lock()
+
+
+def get_email_sender(config):
+    global _email_sender, _email_sender_config
+    with _email_sender_lock:
+        # Após um SIGHUP, load_config() devolve um novo dict: o remetente antigo
+        # (servidor, usuário e senha anteriores) é encerrado e recriado aqui, entre
+        # jobs, e não no handler do sinal, que poderia interromper um envio
+        if _email_sender is not None and config is not _email_sender_config:
+            _email_sender.close()
+            _email_sender = None
+        if _email_sender is None:
+            _email_sender_config = config
+            _email_sender = EmailSender(
+                smtp_server=config['smtp_server'],
+                smtp_port=config['smtp_port'],
+                username=config['smtp_username'],
+                password=config['smtp_password'],
+                use_tls=config['smtp_use_tls']
+            )
+        return _email_sender
+
+
 def get_period_dates(db, days):
-    all_dates = db.get_all_collection_dates()
-    if not all_dates:
-        return []
-    today = datetime.now().date()
-    period = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
-    return [d for d in all_dates if d in period]
+    start_date = (datetime.now().date() - timedelta(days=days - 1)).isoformat()
+    return db.get_collection_dates_since(start_date)
 
 
 def generate_period_summary(db, dates):
@@ -62,30 +109,32 @@ def generate_period_summary(db, dates):
     all_removed = []
     all_modified = []
     
-    current_hosts_final = db.get_hosts_by_date(dates[-1]) 
-    previous_hosts_initial = db.get_hosts_by_date(dates[0])  
-    total_current = len(current_hosts_final)
-    total_previous = len(previous_hosts_initial)
+    # Busca todas as datas do período em uma única consulta
+    hosts_by_date = db.get_hosts_by_dates(dates)
+    total_current = len(hosts_by_date[dates[-1]])
+    total_previous = len(hosts_by_date[dates[0]])
     
-    total_added = 0
-    total_removed = 0
-    total_modified = 0
-    
-    for i in range(1, len(dates)):
-        current_hosts = db.get_hosts_by_date(dates[i])
-        previous_hosts = db.get_hosts_by_date(dates[i-1])
-        comp = comparator.compare_hosts(current_hosts, previous_hosts)
-        total_added += len(comp['added'])
-        total_removed += len(comp['removed'])
-        total_modified += len(comp['modified'])
+    # Cada data é indexada uma única vez: o "atual" de um dia vira o "anterior" do próximo.
+    # As listas são liberadas à medida que são indexadas.
+    previous_hosts = hosts_by_date.pop(dates[0])
+    previous_index = comparator.index_hosts(previous_hosts)
+    for date in dates[1:]:
+        current_hosts = hosts_by_date.pop(date)
+        # Dia sem mudanças: hosts idênticos compartilham o mesmo dict, então a
+        # igualdade das listas é verificada por identidade e o índice é reaproveitado
+        if current_hosts == previous_hosts:
+            continue
+        current_index = comparator.index_hosts(current_hosts)
+        comp = comparator.compare_indexed(current_index, previous_index)
+        previous_hosts, previous_index = current_hosts, current_index
         all_added.extend(comp['added'])
         all_removed.extend(comp['removed'])
         all_modified.extend(comp['modified'])
     
     summary = {
-        'hosts_added': total_added,
-        'hosts_removed': total_removed,
-        'hosts_modified': total_modified,
+        'hosts_added': len(all_added),
+        'hosts_removed': len(all_removed),
+        'hosts_modified': len(all_modified),
         'total_current': total_current,
         'total_previous': total_previous,
         'net_change': total_current - total_previous
@@ -104,45 +153,38 @@ def send_period_report(period_name, days):
     logger.info(f"Iniciando relatorio de {period_name}...")
     
     config = load_config()
-    db = DatabaseManager(config['database_path'])
-    dates = get_period_dates(db, days)
-    
-    if len(dates) < 2:
-        logger.warning(f"Nao ha dados suficientes para gerar o relatorio de {period_name}.")
-        logger.warning(f"Necessario pelo menos 2 datas, encontradas: {len(dates)}")
-        return
-    
-    dates = sorted(dates)
-    logger.info(f"Periodo: {dates[0]} a {dates[-1]} ({len(dates)} datas)")
-    
-    # Gera resumo do período
-    summary, comparison = generate_period_summary(db, dates)
+    # O banco só é usado para montar o resumo: a conexão é fechada antes dos relatórios
+    with DatabaseManager(config['database_path']) as db:
+        dates = get_period_dates(db, days)
+        
+        if len(dates) < 2:
+            logger.warning(f"Nao ha dados suficientes para gerar o relatorio de {period_name}.")
+            logger.warning(f"Necessario pelo menos 2 datas, encontradas: {len(dates)}")
+            return
+        
+        dates = sorted(dates)
+        logger.info(f"Periodo: {dates[0]} a {dates[-1]} ({len(dates)} datas)")
+        
+        # Gera resumo do período
+        summary, comparison = generate_period_summary(db, dates)
+    HostComparator.sort_by_hostname(comparison)
     
     # Gera relatórios
     report_gen = ReportGenerator(config['reports_dir'])
     report_format = config['report_format'].lower()
-    report_files = []
+    has_changes = HostComparator.has_changes(comparison)
+    # O período no nome do arquivo: semanal e mensal terminam na mesma data
+    # e podem rodar juntos (ver test_scheduler_jobs.py)
+    report_files = report_gen.generate_reports(comparison, dates[-1], dates[0],
+                                               report_format, has_changes,
+                                               label=period_name)
     period_label = f"{period_name.capitalize()} {dates[0]} a {dates[-1]}"
-    
-    if report_format in ['html', 'both']:
-        html_path = report_gen.generate_html_report(comparison, dates[-1], dates[0])
-        report_files.append(html_path)
-        logger.info(f"Relatorio HTML gerado: {html_path}")
-    
-    if report_format in ['text', 'both']:
-        text_path = report_gen.generate_text_report(comparison, dates[-1], dates[0])
-        report_files.append(text_path)
-        logger.info(f"Relatorio TXT gerado: {text_path}")
+    for report_path in report_files:
+        logger.info(f"Relatorio gerado: {report_path}")
     
     # Envia por email se configurado
     if config['send_email']:
-        email_sender = EmailSender(
-            smtp_server=config['smtp_server'],
-            smtp_port=config['smtp_port'],
-            username=config['smtp_username'],
-            password=config['smtp_password'],
-            use_tls=config['smtp_use_tls']
-        )
+        email_sender = get_email_sender(config)
         
         attachments = report_files if config['email_attach_reports'] else None
         subject = f"Relatorio {period_name.capitalize()} Zabbix: {dates[0]} a {dates[-1]}"
@@ -151,7 +193,7 @@ def send_period_report(period_name, days):
             recipient_emails=config['email_recipients'],
             report_date=period_label,
             summary=summary,
-            has_changes=(summary['hosts_added'] > 0 or summary['hosts_removed'] > 0 or summary['hosts_modified'] > 0),
+            has_changes=has_changes,
             comparison=comparison,
             report_files=attachments
         )
@@ -169,15 +211,16 @@ def daily_job():
         config = load_config()
         logger.info("Configuracoes carregadas com sucesso")
         
-        collection_date = collect_hosts(config)
-        
-        if collection_date:
-            logger.info(f"Coleta concluida para a data: {collection_date}")
+        with DatabaseManager(config['database_path']) as db:
+            collection_date = collect_hosts(config, db)
             
-            generate_comparison_report(config)
-            logger.info("Relatorio diario concluido!")
-        else:
-            logger.warning("Coleta nao realizada, relatorio diario nao gerado.")
+            if collection_date:
+                logger.info(f"Coleta concluida para a data: {collection_date}")
+                
+                generate_comparison_report(config, email_sender=get_email_sender(config), db=db)
+                logger.info("Relatorio diario concluido!")
+            else:
+                logger.warning("Coleta nao realizada, relatorio diario nao gerado.")
     except Exception as e:
         logger.error(f"Erro no job diario: {e}", exc_info=True)
     logger.info("=" * 80)
@@ -193,12 +236,6 @@ def weekly_job():
         logger.error(f"Erro no job semanal: {e}", exc_info=True)
     logger.info("=" * 80)
 
-def monthly_job_guard():
-    if datetime.now().day == 1:
-        monthly_job()
-    else:
-        logger.debug(f"Dia {datetime.now().day} - pulando job mensal (executa apenas no dia 1)")
-
 def monthly_job():
     logger.info("=" * 80)
     logger.info("Iniciando job mensal...")
@@ -211,6 +248,27 @@ def monthly_job():
     logger.info("=" * 80)
 
 
+def next_monthly_run(now):
+    """Próximo dia 1 às 08:00 a partir de `now`."""
+    next_run = now.replace(day=1, hour=8, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run = (next_run + timedelta(days=32)).replace(day=1)
+    return next_run
+
+
+def schedule_monthly_job():
+    # O schedule não tem recorrência mensal: o job é agendado direto para o
+    # próximo dia 1 e, após executar, se reagenda para o mês seguinte
+    job = schedule.every().day.at("08:00").do(run_monthly_job)
+    job.next_run = next_monthly_run(datetime.now())
+
+
+def run_monthly_job():
+    monthly_job()
+    schedule_monthly_job()
+    return schedule.CancelJob
+
+
 def main():
     logger.info("=" * 80)
     logger.info("Agendador de relatorios Zabbix iniciado")
@@ -219,7 +277,7 @@ def main():
     # Configura os jobs
     schedule.every().day.at("06:00").do(daily_job)
     schedule.every().friday.at("18:00").do(weekly_job)
-    schedule.every().day.at("08:00").do(monthly_job_guard)
+    schedule_monthly_job()
     
     logger.info("Jobs configurados:")
     logger.info("  - Relatorio diario: todo dia as 06:00")
@@ -227,17 +285,29 @@ def main():
     logger.info("  - Relatorio mensal: todo dia 1 as 08:00")
     logger.info("=" * 80)
     
-    # Loop principal
+    signal.signal(signal.SIGTERM, lambda signum, frame: shutdown_event.set())
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_config())
+    
+    # Loop principal: dorme até o próximo job agendado
     try:
-        while True:
+        while not shutdown_event.is_set():
             schedule.run_pending()
-            time.sleep(60)
+            idle = schedule.idle_seconds()
+            if idle is None:
+                break
+            if idle > 0:
+                shutdown_event.wait(min(idle, MAX_IDLE_SECONDS))
+        logger.info("Agendador encerrado")
     except KeyboardInterrupt:
         logger.info("=" * 80)
         logger.info("Agendador interrompido pelo usuario")
         logger.info("=" * 80)
     except Exception as e:
         logger.error(f"Erro no loop principal: {e}", exc_info=True)
+    finally:
+        if _email_sender is not None:
+            _email_sender.close()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,11 @@
 import sqlite3
 
 conn = sqlite3.connect('zabbix_hosts.db')
+conn.execute('PRAGMA journal_mode=WAL')
+conn.execute('PRAGMA synchronous=NORMAL')
+conn.execute('PRAGMA cache_size=-65536')  # 64 MiB
+conn.execute('PRAGMA mmap_size=268435456')  # 256 MiB
+conn.execute('PRAGMA temp_store=MEMORY')
 cursor = conn.cursor()
 
 cursor.execute('''
@@ -21,20 +26,28 @@ for date, total in rows:
 print("\n" + "=" * 80)
 
 cursor.execute('''
-    SELECT collection_date, host_id, COUNT(*) as count
-    FROM hosts_history
-    GROUP BY collection_date, host_id
-    HAVING COUNT(*) > 1
-    LIMIT 10
+    SELECT 1 FROM sqlite_master
+    WHERE type = 'index' AND name = 'uq_hh_date_host'
 ''')
 
-duplicates = cursor.fetchall()
-if duplicates:
-    print("⚠️  DUPLICATAS ENCONTRADAS:")
-    print("=" * 80)
-    for date, host_id, count in duplicates:
-        print(f"{date} - Host {host_id}: {count} vezes")
+if cursor.fetchone():
+    print("✅ Índice único (collection_date, host_id) ativo - duplicatas são impedidas na inserção")
 else:
-    print("✅ Nenhuma duplicata encontrada")
+    cursor.execute('''
+        SELECT collection_date, host_id, COUNT(*) as count
+        FROM hosts_history
+        GROUP BY collection_date, host_id
+        HAVING COUNT(*) > 1
+        LIMIT 10
+    ''')
+
+    duplicates = cursor.fetchall()
+    if duplicates:
+        print("⚠️  DUPLICATAS ENCONTRADAS:")
+        print("=" * 80)
+        for date, host_id, count in duplicates:
+            print(f"{date} - Host {host_id}: {count} vezes")
+    else:
+        print("✅ Nenhuma duplicata encontrada")
 
 conn.close()
@@ -10,6 +10,11 @@ print("LIMPEZA DE DUPLICATAS NO BANCO DE DADOS")
 print("=" * 80)
 
 conn = sqlite3.connect('zabbix_hosts.db')
+conn.execute('PRAGMA journal_mode=WAL')
+conn.execute('PRAGMA synchronous=NORMAL')
+conn.execute('PRAGMA cache_size=-65536')  # 64 MiB
+conn.execute('PRAGMA mmap_size=268435456')  # 256 MiB
+conn.execute('PRAGMA temp_store=MEMORY')
 cursor = conn.cursor()
 
 cursor.execute('''
@@ -41,24 +46,20 @@ if response.lower() != 's':
 
 print("\n🔄 Limpando duplicatas...")
 
-cursor.execute('SELECT DISTINCT collection_date FROM hosts_history')
-dates = cursor.fetchall()
-
-for (date,) in dates:
-    cursor.execute('''
-        DELETE FROM hosts_history
-        WHERE id NOT IN (
-            SELECT MAX(id)
-            FROM hosts_history
-            WHERE collection_date = ?
-            GROUP BY host_id
-        )
-        AND collection_date = ?
-    ''', (date, date))
-    
-    deleted = cursor.rowcount
-    if deleted > 0:
-        print(f"  {date}: {deleted} duplicatas removidas")
+# O índice único uq_hh_date_host(collection_date, host_id) já atende o GROUP BY
+# (id é o rowid e está em todo índice): remove o índice extra de versões anteriores
+cursor.execute('DROP INDEX IF EXISTS idx_hh_date_host')
+
+cursor.execute('''
+    DELETE FROM hosts_history
+    WHERE id NOT IN (
+        SELECT MAX(id)
+        FROM hosts_history
+        GROUP BY collection_date, host_id
+    )
+''')
+
+print(f"  {cursor.rowcount} duplicatas removidas")
 
 conn.commit()
 
@@ -1,8 +1,8 @@
 """
 Módulo para comparar dados de hosts entre diferentes datas.
 """
+from operator import itemgetter
 from typing import List, Dict, Tuple
-from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,48 +11,69 @@ logger = logging.getLogger(__name__)
 class HostComparator:
     """Compara hosts entre diferentes datas para identificar mudanças."""
     
+    @staticmethod
+    def index_hosts(hosts: List[Dict[str, str]]) -> Dict[str, Tuple[Tuple[str, str, str], Dict[str, str]]]:
+        """Indexa hosts por host_id junto com a assinatura (ip, grupos, templates)."""
+        return {
+            host['host_id']: ((host['ip_address'], host['host_groups'], host.get('templates', 'N/A')), host)
+            for host in hosts
+        }
+    
     @staticmethod
     def compare_hosts(current_hosts: List[Dict[str, str]], 
                      previous_hosts: List[Dict[str, str]]) -> Dict[str, List[Dict[str, str]]]:
-        current_ids = {host['host_id'] for host in current_hosts}
-        previous_ids = {host['host_id'] for host in previous_hosts}
-        
-        added_ids = current_ids - previous_ids
-        removed_ids = previous_ids - current_ids
-        
-        current_dict = {host['host_id']: host for host in current_hosts}
-        previous_dict = {host['host_id']: host for host in previous_hosts}
-        
+        result = HostComparator.compare_indexed(
+            HostComparator.index_hosts(current_hosts),
+            HostComparator.index_hosts(previous_hosts)
+        )
+        result['total_current'] = len(current_hosts)
+        result['total_previous'] = len(previous_hosts)
+        return result
+    
+    @staticmethod
+    def compare_indexed(current_index: Dict[str, Tuple[Tuple[str, str, str], Dict[str, str]]], 
+                        previous_index: Dict[str, Tuple[Tuple[str, str, str], Dict[str, str]]]) -> Dict[str, List[Dict[str, str]]]:
+        """Compara hosts já indexados por host_id (ver index_hosts)."""
+        added_hosts = []
+        removed_hosts = []
         modified_hosts = []
-        for host_id in current_ids & previous_ids:
-            current_ip = current_dict[host_id]['ip_address']
-            previous_ip = previous_dict[host_id]['ip_address']
-            current_groups = current_dict[host_id]['host_groups']
-            previous_groups = previous_dict[host_id]['host_groups']
-            current_templates = current_dict[host_id].get('templates', 'N/A')
-            previous_templates = previous_dict[host_id].get('templates', 'N/A')
+        for host_id, (signature, current) in current_index.items():
+            previous_entry = previous_index.get(host_id)
+            if previous_entry is None:
+                added_hosts.append(current)
+                continue
+            
+            previous_signature, previous = previous_entry
+            if signature == previous_signature:
+                continue
+            
+            current_ip, current_groups, current_templates = signature
+            previous_ip, previous_groups, previous_templates = previous_signature
             
-            if current_ip != previous_ip or current_groups != previous_groups or current_templates != previous_templates:
-                modified_hosts.append({
-                    'host_id': host_id,
-                    'hostname': current_dict[host_id]['hostname'],
-                    'old_ip': previous_ip,
-                    'new_ip': current_ip,
-                    'old_groups': previous_groups,
-                    'new_groups': current_groups,
-                    'old_templates': previous_templates,
-                    'new_templates': current_templates,
-                    'ip_changed': current_ip != previous_ip,
-                    'groups_changed': current_groups != previous_groups,
-                    'templates_changed': current_templates != previous_templates
-                })
+            modified_hosts.append({
+                'host_id': host_id,
+                'hostname': current['hostname'],
+                'old_ip': previous_ip,
+                'new_ip': current_ip,
+                'old_groups': previous_groups,
+                'new_groups': current_groups,
+                'old_templates': previous_templates,
+                'new_templates': current_templates,
+                'ip_changed': current_ip != previous_ip,
+                'groups_changed': current_groups != previous_groups,
+                'templates_changed': current_templates != previous_templates
+            })
+        
+        for host_id, (_, previous) in previous_index.items():
+            if host_id not in current_index:
+                removed_hosts.append(previous)
         
         result = {
-            'added': [current_dict[host_id] for host_id in added_ids],
-            'removed': [previous_dict[host_id] for host_id in removed_ids],
+            'added': added_hosts,
+            'removed': removed_hosts,
             'modified': modified_hosts,
-            'total_current': len(current_hosts),
-            'total_previous': len(previous_hosts)
+            'total_current': len(current_index),
+            'total_previous': len(previous_index)
         }
         
         logger.info(f"Comparação: {len(result['added'])} adicionados, "
@@ -61,6 +82,14 @@ class HostComparator:
         
         return result
     
+    @staticmethod
+    def sort_by_hostname(comparison: Dict) -> Dict:
+        """Ordena added/removed/modified por hostname, no próprio dict."""
+        by_hostname = itemgetter('hostname')
+        for key in ('added', 'removed', 'modified'):
+            comparison[key].sort(key=by_hostname)
+        return comparison
+    
     @staticmethod
     def get_summary(comparison: Dict) -> Dict[str, int]:
         return {
@@ -3,104 +3,224 @@ Módulo de gerenciamento do banco de dados SQLite para hosts do Zabbix.
 """
 import sqlite3
 from datetime import datetime
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict
 import logging
 
 logger = logging.getLogger(__name__)
 
+# PRAGMAs por conexão (journal_mode=WAL é persistente e definido em init_database)
+_CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+)
+
+# SQL fixo reutilizado: o sqlite3 mantém o statement preparado em cache por texto
+_INSERT_HOST_SQL = '''
+    INSERT OR REPLACE INTO hosts_history (host_id, hostname, ip_address, host_groups, templates, collection_date)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+_SELECT_HOSTS_BY_DATE_SQL = '''
+    SELECT host_id, hostname, ip_address, host_groups, COALESCE(templates, 'N/A') AS templates
+    FROM hosts_history
+    WHERE collection_date = ?
+    ORDER BY hostname
+'''
+
 
 class DatabaseManager:
     def __init__(self, db_path: str = "zabbix_hosts.db"):
         self.db_path = db_path
+        # Conexão única reaproveitada por todos os métodos (mantém o cache de páginas)
+        self._conn = self._connect()
         self.init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None: transações são abertas explicitamente (ver save_hosts)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=64, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+    
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+    
     def init_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
+        # Criação do schema e migrações em uma única transação (um commit só,
+        # e um banco nunca fica com a migração pela metade)
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS hosts_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    host_id TEXT NOT NULL,
+                    hostname TEXT NOT NULL,
+                    ip_address TEXT,
+                    host_groups TEXT,
+                    collection_date DATE NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    templates TEXT DEFAULT 'N/A'
+                )
+            ''')
+            
+            # Bancos criados antes da coluna templates
+            cursor.execute('PRAGMA table_info(hosts_history)')
+            columns = {row[1] for row in cursor.fetchall()}
+            if 'templates' not in columns:
+                cursor.execute("ALTER TABLE hosts_history ADD COLUMN templates TEXT DEFAULT 'N/A'")
+                logger.info("Coluna templates adicionada a hosts_history")
+            
+            # Atende o filtro por data e a ordenação por hostname direto pelo índice
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_date_hostname
+                ON hosts_history(collection_date, hostname)
+            ''')
+            cursor.execute('DROP INDEX IF EXISTS idx_collection_date')
+            # Coberto pelo índice único uq_hh_date_host (id é o rowid, presente em todo índice)
+            cursor.execute('DROP INDEX IF EXISTS idx_hh_date_host')
+            
+            self._ensure_unique_host_per_date(cursor)
+            
+            cursor.execute('COMMIT')
+        except BaseException:
+            # Qualquer falha desfaz a transação e libera a escrita na conexão
+            if self._conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        
+        logger.info(f"Banco de dados inicializado: {self.db_path}")
+    
+    def _ensure_unique_host_per_date(self, cursor):
+        """Migração: remove duplicatas e impede novas com um índice único."""
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS hosts_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                host_id TEXT NOT NULL,
-                hostname TEXT NOT NULL,
-                ip_address TEXT,
-                host_groups TEXT,
-                collection_date DATE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                templates TEXT DEFAULT 'N/A'
-            )
+            SELECT 1 FROM sqlite_master
+            WHERE type = 'index' AND name = 'uq_hh_date_host'
         ''')
+        if cursor.fetchone():
+            return
         
         cursor.execute('''
-            CREATE INDEX IF NOT EXISTS idx_collection_date 
-            ON hosts_history(collection_date)
+            DELETE FROM hosts_history
+            WHERE id NOT IN (
+                SELECT MAX(id)
+                FROM hosts_history
+                GROUP BY collection_date, host_id
+            )
         ''')
+        if cursor.rowcount > 0:
+            logger.info(f"Removidas {cursor.rowcount} duplicatas de hosts_history")
         
-        conn.commit()
-        conn.close()
-        logger.info(f"Banco de dados inicializado: {self.db_path}")
+        cursor.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_hh_date_host
+            ON hosts_history(collection_date, host_id)
+        ''')
     
-    def save_hosts(self, hosts: List[Dict[str, str]], collection_date: str = None):
+    def save_hosts(self, hosts: Iterable[Dict[str, str]], collection_date: str = None):
         if collection_date is None:
             collection_date = datetime.now().strftime("%Y-%m-%d")
         
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            DELETE FROM hosts_history
-            WHERE collection_date = ?
-        ''', (collection_date,))
-        
-        logger.info(f"Registros anteriores da data {collection_date} removidos")
-        
-        for host in hosts:
-            cursor.execute('''
-                INSERT INTO hosts_history (host_id, hostname, ip_address, host_groups, templates, collection_date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
+        # Gerador: as tuplas são produzidas sob demanda pelo executemany
+        rows = (
+            (
                 host.get('host_id'),
                 host.get('hostname'),
                 host.get('ip_address'),
                 host.get('host_groups'),
                 host.get('templates', 'N/A'),
                 collection_date
-            ))
+            )
+            for host in hosts
+        )
+        
+        cursor = self._conn.cursor()
         
-        conn.commit()
-        conn.close()
-        logger.info(f"Salvos {len(hosts)} hosts para a data {collection_date}")
+        # DELETE e INSERTs na mesma transação: uma falha desfaz tudo.
+        # IMMEDIATE reserva a escrita logo no início, com um único commit no final.
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            cursor.execute('''
+                DELETE FROM hosts_history
+                WHERE collection_date = ?
+            ''', (collection_date,))
+            
+            logger.info(f"Registros anteriores da data {collection_date} removidos")
+            
+            cursor.executemany(_INSERT_HOST_SQL, rows)
+            saved = cursor.rowcount
+            
+            cursor.execute('COMMIT')
+        except BaseException:
+            # Qualquer falha (inclusive do iterável de hosts, lido dentro do
+            # executemany) desfaz a transação e libera a escrita na conexão
+            if self._conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        
+        logger.info(f"Salvos {saved} hosts para a data {collection_date}")
     
     def get_hosts_by_date(self, date: str) -> List[Dict[str, str]]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
-        cursor.execute('''
-            SELECT host_id, hostname, ip_address, host_groups, templates
+        cursor.execute(_SELECT_HOSTS_BY_DATE_SQL, (date,))
+        
+        return [dict(row) for row in cursor]
+    
+    def get_hosts_by_dates(self, dates: List[str]) -> Dict[str, List[Dict[str, str]]]:
+        hosts_by_date = {date: [] for date in dates}
+        if not dates:
+            return hosts_by_date
+        
+        cursor = self._conn.cursor()
+        
+        placeholders = ', '.join('?' for _ in dates)
+        cursor.execute(f'''
+            SELECT collection_date, host_id, hostname, ip_address, host_groups,
+                   COALESCE(templates, 'N/A') AS templates
             FROM hosts_history
-            WHERE collection_date = ?
+            WHERE collection_date IN ({placeholders})
             ORDER BY hostname
-        ''', (date,))
+        ''', tuple(dates))
         
         rows = cursor.fetchall()
-        conn.close()
-        
-        hosts = [
-            {
-                'host_id': row[0],
-                'hostname': row[1],
-                'ip_address': row[2],
-                'host_groups': row[3],
-                'templates': row[4] if len(row) > 4 else 'N/A'
-            }
-            for row in rows
-        ]
-        
-        return hosts
+        
+        # Hosts idênticos em datas diferentes compartilham o mesmo dict,
+        # evitando uma cópia por dia em períodos longos
+        shared_hosts = {}
+        for row in rows:
+            values = row[1:]
+            host = shared_hosts.get(values)
+            if host is None:
+                host = shared_hosts[values] = {
+                    'host_id': row[1],
+                    'hostname': row[2],
+                    'ip_address': row[3],
+                    'host_groups': row[4],
+                    'templates': row[5]
+                }
+            hosts_by_date[row[0]].append(host)
+        
+        return hosts_by_date
     
     def get_latest_collection_date(self) -> str:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
         cursor.execute('''
             SELECT collection_date
@@ -110,27 +230,34 @@ class DatabaseManager:
         ''')
         
         result = cursor.fetchone()
-        conn.close()
         
         return result[0] if result else None
     
+    def get_previous_collection_date(self, date: str) -> str:
+        """Retorna a coleta mais recente anterior a date, ou None."""
+        cursor = self._conn.cursor()
+        
+        cursor.execute('''
+            SELECT MAX(collection_date)
+            FROM hosts_history
+            WHERE collection_date < ?
+        ''', (date,))
+        
+        return cursor.fetchone()[0]
+    
     def check_date_exists(self, date: str) -> bool:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
         cursor.execute('''
-            SELECT COUNT(*) FROM hosts_history
+            SELECT 1 FROM hosts_history
             WHERE collection_date = ?
+            LIMIT 1
         ''', (date,))
         
-        count = cursor.fetchone()[0]
-        conn.close()
-        
-        return count > 0
+        return cursor.fetchone() is not None
     
     def get_all_collection_dates(self) -> List[str]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self._conn.cursor()
         
         cursor.execute('''
             SELECT DISTINCT collection_date
@@ -139,6 +266,19 @@ class DatabaseManager:
         ''')
         
         dates = [row[0] for row in cursor.fetchall()]
-        conn.close()
+        
+        return dates
+    
+    def get_collection_dates_since(self, start_date: str) -> List[str]:
+        cursor = self._conn.cursor()
+        
+        cursor.execute('''
+            SELECT DISTINCT collection_date
+            FROM hosts_history
+            WHERE collection_date >= ?
+            ORDER BY collection_date
+        ''', (start_date,))
+        
+        dates = [row[0] for row in cursor.fetchall()]
         
         return dates
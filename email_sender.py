@@ -3,127 +3,57 @@ Módulo para envio de emails com relatórios.
 """
 import smtplib
 import os
+import io
+import base64
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
-from email import encoders
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Escape HTML dos valores vindos do Zabbix (str.translate é uma única passada em C)
+_HTML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
 
-class EmailSender:
-    def __init__(self, smtp_server: str, smtp_port: int, username: str, 
-                 password: str, use_tls: bool = True):
-        self.smtp_server = smtp_server
-        self.smtp_port = smtp_port
-        self.username = username
-        self.password = password
-        self.use_tls = use_tls
-    
-    def send_report_email(self, recipient_emails: List[str], subject: str,
-                         body_html: str, body_text: str = None,
-                         attachments: List[str] = None) -> bool:
-        try:
-            # Cria mensagem
-            msg = MIMEMultipart('alternative')
-            msg['From'] = self.username
-            msg['To'] = ', '.join(recipient_emails)
-            msg['Subject'] = subject
-            
-            if body_text:
-                part_text = MIMEText(body_text, 'plain', 'utf-8')
-                msg.attach(part_text)
-            
-            part_html = MIMEText(body_html, 'html', 'utf-8')
-            msg.attach(part_html)
-            
-            if attachments:
-                for filepath in attachments:
-                    if os.path.exists(filepath):
-                        self._attach_file(msg, filepath)
-                    else:
-                        logger.warning(f"Arquivo não encontrado: {filepath}")
-            
-            logger.info(f"Conectando ao servidor SMTP: {self.smtp_server}:{self.smtp_port}")
-            
-            if self.use_tls:
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-                server.starttls()
-            else:
-                server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-            
-            server.login(self.username, self.password)
-            
-            logger.info(f"Enviando email para: {', '.join(recipient_emails)}")
-            server.send_message(msg)
-            server.quit()
-            
-            logger.info("✅ Email enviado com sucesso!")
-            return True
-            
-        except Exception as e:
-            logger.error(f"❌ Erro ao enviar email: {e}", exc_info=True)
-            return False
-    
-    def _attach_file(self, msg: MIMEMultipart, filepath: str):
-        try:
-            filename = os.path.basename(filepath)
-            
-            with open(filepath, 'rb') as f:
-                part = MIMEBase('application', 'octet-stream')
-                part.set_payload(f.read())
-            
-            encoders.encode_base64(part)
-            part.add_header(
-                'Content-Disposition',
-                f'attachment; filename= {filename}'
-            )
-            
-            msg.attach(part)
-            logger.info(f"Arquivo anexado: {filename}")
-            
-        except Exception as e:
-            logger.error(f"Erro ao anexar arquivo {filepath}: {e}")
-    
-    def send_simple_report(self, recipient_emails: List[str], 
-                          report_date: str, summary: dict,
-                          has_changes: bool, comparison: dict = None,
-                          report_files: List[str] = None) -> bool:
-        subject = f"Relatório Zabbix - {report_date}"
-        
-        if not has_changes:
-            subject += " - Sem Mudanças"
-        elif summary['hosts_added'] > 0 or summary['hosts_removed'] > 0:
-            subject += f" - {summary['hosts_added']} Adicionados, {summary['hosts_removed']} Removidos"
-        
-        body_html = self._build_email_body_html(report_date, summary, has_changes, comparison)
-        
-        body_text = self._build_email_body_text(report_date, summary, has_changes, comparison)
-        
-        return self.send_report_email(
-            recipient_emails=recipient_emails,
-            subject=subject,
-            body_html=body_html,
-            body_text=body_text,
-            attachments=report_files
-        )
-    
-    def _build_email_body_html(self, report_date: str, summary: dict, 
-                               has_changes: bool, comparison: dict = None) -> str:
-        
-        status_icon = "✅" if not has_changes else "⚠️"
-        status_text = "Nenhuma mudança detectada" if not has_changes else "Mudanças detectadas"
-        status_color = "#28a745" if not has_changes else "#ffc107"
-        
-        html = f"""
+
+def _escape(value) -> str:
+    return str(value).translate(_HTML_ESCAPE)
+
+
+# Campos exibidos para hosts modificados:
+# (flag de mudança, rótulo, chave anterior, chave atual, largura máxima no texto)
+_MODIFIED_FIELDS = (
+    ('ip_changed', 'IP', 'old_ip', 'new_ip', None),
+    ('groups_changed', 'Grupos', 'old_groups', 'new_groups', 19),
+    ('templates_changed', 'Templates', 'old_templates', 'new_templates', 19),
+)
+
+_EMAIL_HTML_MODIFIED_ROW = """
+                    <tr class="modified">
+                        <td>{host_id}</td>
+                        <td><strong>{hostname}</strong></td>
+                        <td>{label}</td>
+                        <td>{old}</td>
+                        <td>{new}</td>
+                    </tr>
+"""
+
+_EMAIL_TEXT_MODIFIED_ROW = "{host_id:<15} {hostname:<25} {label:<10} {old:<20} {new:<20}\n"
+
+# Bytes lidos por vez ao anexar arquivos (1024 linhas base64)
+_ATTACHMENT_CHUNK_SIZE = 57 * 1024
+
+# Cabeçalho estático do email HTML (o status varia apenas pela classe CSS)
+_EMAIL_HTML_HEAD = """
 <!DOCTYPE html>
 <html>
 <head>
     <meta charset="UTF-8">
     <style>
-        body {{
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             line-height: 1.6;
             color: #333;
@@ -131,125 +61,319 @@ class EmailSender:
             margin: 0 auto;
             padding: 20px;
             background-color: #f5f5f5;
-        }}
-        .header {{
+        }
+        .header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 30px;
             border-radius: 8px 8px 0 0;
             text-align: center;
-        }}
-        .header h1 {{
+        }
+        .header h1 {
             margin: 0;
             font-size: 24px;
-        }}
-        .status {{
-            background-color: {status_color};
+        }
+        .status {
             color: white;
             padding: 15px;
             text-align: center;
             font-weight: bold;
             font-size: 18px;
-        }}
-        .content {{
+        }
+        .status.ok {
+            background-color: #28a745;
+        }
+        .status.changed {
+            background-color: #ffc107;
+        }
+        .content {
             background-color: #fff;
             padding: 30px;
             border: 1px solid #ddd;
             border-top: none;
-        }}
-        .summary {{
+        }
+        .summary {
             background-color: #f8f9fa;
             padding: 20px;
             border-radius: 5px;
             margin: 20px 0;
-        }}
-        .summary-item {{
+        }
+        .summary-item {
             display: flex;
             justify-content: space-between;
             padding: 10px 0;
             border-bottom: 1px solid #dee2e6;
-        }}
-        .summary-item:last-child {{
+        }
+        .summary-item:last-child {
             border-bottom: none;
-        }}
-        .summary-label {{
+        }
+        .summary-label {
             font-weight: 600;
             color: #666;
-        }}
-        .summary-value {{
+        }
+        .summary-value {
             font-weight: bold;
             color: #007bff;
             font-size: 18px;
-        }}
-        .summary-value.positive {{
+        }
+        .summary-value.positive {
             color: #28a745;
-        }}
-        .summary-value.negative {{
+        }
+        .summary-value.negative {
             color: #dc3545;
-        }}
-        .summary-value.warning {{
+        }
+        .summary-value.warning {
             color: #ffc107;
-        }}
-        .hosts-section {{
+        }
+        .hosts-section {
             margin: 30px 0;
-        }}
-        .hosts-section h3 {{
+        }
+        .hosts-section h3 {
             color: #333;
             margin-bottom: 15px;
             padding-bottom: 10px;
             border-bottom: 2px solid #007bff;
-        }}
-        .host-table {{
+        }
+        .host-table {
             width: 100%;
             border-collapse: collapse;
             margin-top: 10px;
             font-size: 14px;
-        }}
-        .host-table th {{
+        }
+        .host-table th {
             background-color: #007bff;
             color: white;
             padding: 10px;
             text-align: left;
             font-weight: 600;
-        }}
-        .host-table td {{
+        }
+        .host-table td {
             padding: 10px;
             border-bottom: 1px solid #dee2e6;
-        }}
-        .host-table tr:hover {{
+        }
+        .host-table tr:hover {
             background-color: #f8f9fa;
-        }}
-        .host-table tr.added {{
+        }
+        .host-table tr.added {
             background-color: #d4edda;
-        }}
-        .host-table tr.removed {{
+        }
+        .host-table tr.removed {
             background-color: #f8d7da;
-        }}
-        .host-table tr.modified {{
+        }
+        .host-table tr.modified {
             background-color: #fff3cd;
-        }}
-        .no-hosts {{
+        }
+        .no-hosts {
             color: #666;
             font-style: italic;
             padding: 10px;
-        }}
-        .footer {{
+        }
+        .footer {
             background-color: #f8f9fa;
             padding: 20px;
             text-align: center;
             border-radius: 0 0 8px 8px;
             color: #666;
             font-size: 14px;
-        }}
+        }
     </style>
 </head>
 <body>
-    <div class="header">
+"""
+
+
+class EmailSender:
+    def __init__(self, smtp_server: str, smtp_port: int, username: str, 
+                 password: str, use_tls: bool = True):
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._server = None
+        # Protege a conexão SMTP compartilhada quando jobs enviam em paralelo
+        self._lock = threading.RLock()
+    
+    def _connect(self) -> smtplib.SMTP:
+        logger.info(f"Conectando ao servidor SMTP: {self.smtp_server}:{self.smtp_port}")
+        
+        if self.use_tls:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+            server.starttls()
+        else:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
+        
+        server.login(self.username, self.password)
+        return server
+    
+    def _get_server(self) -> smtplib.SMTP:
+        """Reutiliza a conexão SMTP aberta, reconectando se ela caiu."""
+        with self._lock:
+            if self._server is not None:
+                try:
+                    if self._server.noop()[0] == 250:
+                        return self._server
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._server = None
+            
+            self._server = self._connect()
+            return self._server
+    
+    def close(self):
+        with self._lock:
+            if self._server is not None:
+                try:
+                    self._server.quit()
+                except (smtplib.SMTPException, OSError):
+                    pass
+                self._server = None
+                logger.info("Conexão SMTP encerrada")
+    
+    def build_message(self, subject: str, body_html: str, body_text: str = None,
+                      attachments: List[str] = None) -> MIMEMultipart:
+        """Monta a mensagem uma única vez; o destinatário é definido em deliver()."""
+        msg = MIMEMultipart('alternative')
+        msg['From'] = self.username
+        msg['Subject'] = subject
+        
+        if body_text:
+            part_text = MIMEText(body_text, 'plain', 'utf-8')
+            msg.attach(part_text)
+        
+        part_html = MIMEText(body_html, 'html', 'utf-8')
+        msg.attach(part_html)
+        
+        if attachments:
+            for filepath in attachments:
+                if os.path.exists(filepath):
+                    self._attach_file(msg, filepath)
+                else:
+                    logger.warning(f"Arquivo não encontrado: {filepath}")
+        
+        return msg
+    
+    def deliver(self, msg: MIMEMultipart, recipient_emails: List[str],
+                server: smtplib.SMTP = None):
+        """Envia uma mensagem já montada, trocando apenas o cabeçalho To.
+        
+        server é uma conexão recém-obtida de _get_server(); ainda sendo a
+        conexão atual, é usada sem um novo NOOP.
+        """
+        del msg['To']
+        msg['To'] = ', '.join(recipient_emails)
+        
+        with self._lock:
+            if server is None or server is not self._server:
+                server = self._get_server()
+            
+            logger.info(f"Enviando email para: {', '.join(recipient_emails)}")
+            try:
+                server.send_message(msg, to_addrs=recipient_emails)
+            except smtplib.SMTPServerDisconnected:
+                # A conexão reaproveitada pode cair entre o NOOP e o envio
+                logger.warning("Conexão SMTP perdida, reconectando...")
+                self._server = None
+                self._get_server().send_message(msg, to_addrs=recipient_emails)
+    
+    def send_report_email(self, recipient_emails: List[str], subject: str,
+                         body_html: str, body_text: str = None,
+                         attachments: List[str] = None,
+                         server: smtplib.SMTP = None) -> bool:
+        try:
+            msg = self.build_message(subject, body_html, body_text, attachments)
+            self.deliver(msg, recipient_emails, server)
+            
+            logger.info("✅ Email enviado com sucesso!")
+            return True
+            
+        except Exception as e:
+            logger.error(f"❌ Erro ao enviar email: {e}", exc_info=True)
+            self.close()
+            return False
+    
+    def _attach_file(self, msg: MIMEMultipart, filepath: str):
+        try:
+            filename = os.path.basename(filepath)
+            
+            # Codifica em blocos; o tamanho é múltiplo de 57 bytes (uma linha
+            # base64 de 76 caracteres) para não gerar padding no meio do arquivo
+            encoded = io.StringIO()
+            with open(filepath, 'rb') as f:
+                while True:
+                    chunk = f.read(_ATTACHMENT_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    encoded.write(base64.encodebytes(chunk).decode('ascii'))
+            
+            part = MIMEBase('application', 'octet-stream')
+            part.set_payload(encoded.getvalue())
+            part['Content-Transfer-Encoding'] = 'base64'
+            part.add_header(
+                'Content-Disposition',
+                f'attachment; filename= {filename}'
+            )
+            
+            msg.attach(part)
+            logger.info(f"Arquivo anexado: {filename}")
+            
+        except Exception as e:
+            logger.error(f"Erro ao anexar arquivo {filepath}: {e}")
+    
+    def send_simple_report(self, recipient_emails: List[str], 
+                          report_date: str, summary: dict,
+                          has_changes: bool, comparison: dict = None,
+                          report_files: List[str] = None) -> bool:
+        """Monta e envia o email do relatório.
+        
+        As listas de comparison devem vir ordenadas por hostname
+        (HostComparator.sort_by_hostname), como nos relatórios gerados.
+        """
+        subject = f"Relatório Zabbix - {report_date}"
+        
+        if not has_changes:
+            subject += " - Sem Mudanças"
+        elif summary['hosts_added'] > 0 or summary['hosts_removed'] > 0:
+            subject += f" - {summary['hosts_added']} Adicionados, {summary['hosts_removed']} Removidos"
+        
+        # Abre (ou valida) a conexão SMTP enquanto os corpos são montados
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            server_future = executor.submit(self._get_server)
+            
+            body_html = self._build_email_body_html(report_date, summary, has_changes, comparison)
+            
+            body_text = self._build_email_body_text(report_date, summary, has_changes, comparison)
+        
+        # Uma falha de conexão ou login não é repetida no envio: uma nova
+        # tentativa só somaria outro timeout ou outro AUTH recusado
+        try:
+            server = server_future.result()
+        except Exception as e:
+            logger.error(f"❌ Erro ao conectar ao servidor SMTP: {e}", exc_info=True)
+            return False
+        
+        return self.send_report_email(
+            recipient_emails=recipient_emails,
+            subject=subject,
+            body_html=body_html,
+            body_text=body_text,
+            attachments=report_files,
+            server=server
+        )
+    
+    def _build_email_body_html(self, report_date: str, summary: dict, 
+                               has_changes: bool, comparison: dict = None) -> str:
+        
+        status_icon = "✅" if not has_changes else "⚠️"
+        status_text = "Nenhuma mudança detectada" if not has_changes else "Mudanças detectadas"
+        status_class = "ok" if not has_changes else "changed"
+        
+        parts = [_EMAIL_HTML_HEAD, f"""    <div class="header">
         <h1>Relatório Diário Zabbix</h1>
         <p style="margin: 10px 0 0 0;">Data: {report_date}</p>
     </div>
     
-    <div class="status">
+    <div class="status {status_class}">
         {status_icon} {status_text}
     </div>
     
@@ -285,10 +409,10 @@ class EmailSender:
                 <span class="summary-value warning">{summary['hosts_modified']}</span>
             </div>
         </div>
-"""
+"""]
         
         if comparison and comparison.get('added'):
-            html += """
+            parts.append("""
         <div class="hosts-section">
             <h3>✅ Hosts Adicionados</h3>
             <table class="host-table">
@@ -302,26 +426,26 @@ class EmailSender:
                     </tr>
                 </thead>
                 <tbody>
-"""
-            for host in sorted(comparison['added'], key=lambda x: x['hostname']):
+""")
+            for host in comparison['added']:
                 templates = host.get('templates', 'N/A')
-                html += f"""
+                parts.append(f"""
                     <tr class="added">
-                        <td>{host['host_id']}</td>
-                        <td><strong>{host['hostname']}</strong></td>
-                        <td>{host['ip_address']}</td>
-                        <td>{host['host_groups']}</td>
-                        <td>{templates}</td>
+                        <td>{_escape(host['host_id'])}</td>
+                        <td><strong>{_escape(host['hostname'])}</strong></td>
+                        <td>{_escape(host['ip_address'])}</td>
+                        <td>{_escape(host['host_groups'])}</td>
+                        <td>{_escape(templates)}</td>
                     </tr>
-"""
-            html += """
+""")
+            parts.append("""
                 </tbody>
             </table>
         </div>
-"""
+""")
         
         if comparison and comparison.get('removed'):
-            html += """
+            parts.append("""
         <div class="hosts-section">
             <h3>❌ Hosts Removidos</h3>
             <table class="host-table">
@@ -335,26 +459,26 @@ class EmailSender:
                     </tr>
                 </thead>
                 <tbody>
-"""
-            for host in sorted(comparison['removed'], key=lambda x: x['hostname']):
+""")
+            for host in comparison['removed']:
                 templates = host.get('templates', 'N/A')
-                html += f"""
+                parts.append(f"""
                     <tr class="removed">
-                        <td>{host['host_id']}</td>
-                        <td><strong>{host['hostname']}</strong></td>
-                        <td>{host['ip_address']}</td>
-                        <td>{host['host_groups']}</td>
-                        <td>{templates}</td>
+                        <td>{_escape(host['host_id'])}</td>
+                        <td><strong>{_escape(host['hostname'])}</strong></td>
+                        <td>{_escape(host['ip_address'])}</td>
+                        <td>{_escape(host['host_groups'])}</td>
+                        <td>{_escape(templates)}</td>
                     </tr>
-"""
-            html += """
+""")
+            parts.append("""
                 </tbody>
             </table>
         </div>
-"""
+""")
         
         if comparison and comparison.get('modified'):
-            html += """
+            parts.append("""
         <div class="hosts-section">
             <h3>🔄 Hosts Modificados</h3>
             <table class="host-table">
@@ -368,58 +492,37 @@ class EmailSender:
                     </tr>
                 </thead>
                 <tbody>
-"""
-            for host in sorted(comparison['modified'], key=lambda x: x['hostname']):
-                if host.get('ip_changed'):
-                    html += f"""
-                    <tr class="modified">
-                        <td>{host['host_id']}</td>
-                        <td><strong>{host['hostname']}</strong></td>
-                        <td>IP</td>
-                        <td>{host['old_ip']}</td>
-                        <td>{host['new_ip']}</td>
-                    </tr>
-"""
-                if host.get('groups_changed'):
-                    html += f"""
-                    <tr class="modified">
-                        <td>{host['host_id']}</td>
-                        <td><strong>{host['hostname']}</strong></td>
-                        <td>Grupos</td>
-                        <td>{host['old_groups']}</td>
-                        <td>{host['new_groups']}</td>
-                    </tr>
-"""
-                if host.get('templates_changed'):
-                    html += f"""
-                    <tr class="modified">
-                        <td>{host['host_id']}</td>
-                        <td><strong>{host['hostname']}</strong></td>
-                        <td>Templates</td>
-                        <td>{host.get('old_templates', 'N/A')}</td>
-                        <td>{host.get('new_templates', 'N/A')}</td>
-                    </tr>
-"""
-            html += """
+""")
+            for host in comparison['modified']:
+                host_id = _escape(host['host_id'])
+                hostname = _escape(host['hostname'])
+                for flag, label, old_key, new_key, _ in _MODIFIED_FIELDS:
+                    if host.get(flag):
+                        parts.append(_EMAIL_HTML_MODIFIED_ROW.format(
+                            host_id=host_id, hostname=hostname, label=label,
+                            old=_escape(host.get(old_key, 'N/A')),
+                            new=_escape(host.get(new_key, 'N/A'))
+                        ))
+            parts.append("""
                 </tbody>
             </table>
         </div>
-"""
+""")
         
         if not has_changes:
-            html += """
+            parts.append("""
         <p style="color: #666; margin-top: 20px; text-align: center; font-size: 16px;">
             ✅ Não há mudanças para reportar nesta data.
         </p>
-"""
+""")
         else:
-            html += """
+            parts.append("""
         <p style="color: #666; margin-top: 30px; font-style: italic;">
             📎 Relatório automatico.
         </p>
-"""
+""")
         
-        html += """
+        parts.append("""
     </div>
     
     <div class="footer">
@@ -428,9 +531,9 @@ class EmailSender:
     </div>
 </body>
 </html>
-"""
+""")
         
-        return html
+        return "".join(parts)
     
     def _build_email_body_text(self, report_date: str, summary: dict, 
                                has_changes: bool, comparison: dict = None) -> str:
@@ -438,7 +541,7 @@ class EmailSender:
         
         status_text = "Nenhuma mudança detectada" if not has_changes else "Mudanças detectadas"
         
-        text = f"""
+        parts = [f"""
 RELATÓRIO DIÁRIO ZABBIX
 Data: {report_date}
 
@@ -453,65 +556,66 @@ Variação: {summary['net_change']:+d}
 Hosts Adicionados: {summary['hosts_added']}
 Hosts Removidos: {summary['hosts_removed']}
 Hosts Modificados: {summary['hosts_modified']}
-"""
+"""]
         
         if comparison and comparison.get('added'):
-            text += f"\n{'=' * 80}\n"
-            text += f"HOSTS ADICIONADOS ({len(comparison['added'])})\n"
-            text += f"{'=' * 80}\n"
-            text += f"{'ID':<12} {'Nome':<25} {'IP':<15} {'Grupos':<25}\n"
-            text += f"{'-' * 80}\n"
-            for host in sorted(comparison['added'], key=lambda x: x['hostname']):
-                hostname = host['hostname'][:24] if len(host['hostname']) > 24 else host['hostname']
-                groups = host['host_groups'][:24] if len(host['host_groups']) > 24 else host['host_groups']
-                text += f"{host['host_id']:<12} {hostname:<25} {host['ip_address']:<15} {groups:<25}\n"
+            parts.append(f"\n{'=' * 80}\n")
+            parts.append(f"HOSTS ADICIONADOS ({len(comparison['added'])})\n")
+            parts.append(f"{'=' * 80}\n")
+            parts.append(f"{'ID':<12} {'Nome':<25} {'IP':<15} {'Grupos':<25}\n")
+            parts.append(f"{'-' * 80}\n")
+            for host in comparison['added']:
+                parts.append(f"{host['host_id']:<12} {host['hostname'][:24]:<25} {host['ip_address']:<15} {host['host_groups'][:24]:<25}\n")
                 templates = host.get('templates', 'N/A')
                 if templates != 'N/A':
-                    text += f"             Templates: {templates}\n"
+                    parts.append(f"             Templates: {templates}\n")
         
         if comparison and comparison.get('removed'):
-            text += f"\n{'=' * 80}\n"
-            text += f"HOSTS REMOVIDOS ({len(comparison['removed'])})\n"
-            text += f"{'=' * 80}\n"
-            text += f"{'ID':<12} {'Nome':<25} {'IP':<15} {'Grupos':<25}\n"
-            text += f"{'-' * 80}\n"
-            for host in sorted(comparison['removed'], key=lambda x: x['hostname']):
-                hostname = host['hostname'][:24] if len(host['hostname']) > 24 else host['hostname']
-                groups = host['host_groups'][:24] if len(host['host_groups']) > 24 else host['host_groups']
-                text += f"{host['host_id']:<12} {hostname:<25} {host['ip_address']:<15} {groups:<25}\n"
+            parts.append(f"\n{'=' * 80}\n")
+            parts.append(f"HOSTS REMOVIDOS ({len(comparison['removed'])})\n")
+            parts.append(f"{'=' * 80}\n")
+            parts.append(f"{'ID':<12} {'Nome':<25} {'IP':<15} {'Grupos':<25}\n")
+            parts.append(f"{'-' * 80}\n")
+            for host in comparison['removed']:
+                parts.append(f"{host['host_id']:<12} {host['hostname'][:24]:<25} {host['ip_address']:<15} {host['host_groups'][:24]:<25}\n")
                 templates = host.get('templates', 'N/A')
                 if templates != 'N/A':
-                    text += f"             Templates: {templates}\n"
+                    parts.append(f"             Templates: {templates}\n")
         
         if comparison and comparison.get('modified'):
-            text += f"\n{'=' * 80}\n"
-            text += f"HOSTS MODIFICADOS ({len(comparison['modified'])})\n"
-            text += f"{'=' * 80}\n"
-            text += f"{'ID':<15} {'Nome do Host':<25} {'Campo':<10} {'Anterior':<20} {'Atual':<20}\n"
-            text += f"{'-' * 80}\n"
-            for host in sorted(comparison['modified'], key=lambda x: x['hostname']):
-                hostname = host['hostname'][:24] if len(host['hostname']) > 24 else host['hostname']
-                if host.get('ip_changed'):
-                    text += f"{host['host_id']:<15} {hostname:<25} {'IP':<10} {host['old_ip']:<20} {host['new_ip']:<20}\n"
-                if host.get('groups_changed'):
-                    old_g = host['old_groups'][:19] if len(host['old_groups']) > 19 else host['old_groups']
-                    new_g = host['new_groups'][:19] if len(host['new_groups']) > 19 else host['new_groups']
-                    text += f"{host['host_id']:<15} {hostname:<25} {'Grupos':<10} {old_g:<20} {new_g:<20}\n"
-                if host.get('templates_changed'):
-                    old_t = host.get('old_templates', 'N/A')[:19] if len(host.get('old_templates', 'N/A')) > 19 else host.get('old_templates', 'N/A')
-                    new_t = host.get('new_templates', 'N/A')[:19] if len(host.get('new_templates', 'N/A')) > 19 else host.get('new_templates', 'N/A')
-                    text += f"{host['host_id']:<15} {hostname:<25} {'Templates':<10} {old_t:<20} {new_t:<20}\n"
+            parts.append(f"\n{'=' * 80}\n")
+            parts.append(f"HOSTS MODIFICADOS ({len(comparison['modified'])})\n")
+            parts.append(f"{'=' * 80}\n")
+            parts.append(f"{'ID':<15} {'Nome do Host':<25} {'Campo':<10} {'Anterior':<20} {'Atual':<20}\n")
+            parts.append(f"{'-' * 80}\n")
+            for host in comparison['modified']:
+                hostname = host['hostname'][:24]
+                for flag, label, old_key, new_key, width in _MODIFIED_FIELDS:
+                    if host.get(flag):
+                        parts.append(_EMAIL_TEXT_MODIFIED_ROW.format(
+                            host_id=host['host_id'], hostname=hostname, label=label,
+                            old=host.get(old_key, 'N/A')[:width],
+                            new=host.get(new_key, 'N/A')[:width]
+                        ))
         
-        text += f"\n{'=' * 80}\n"
+        parts.append(f"\n{'=' * 80}\n")
         if has_changes:
-            text += "O relatório detalhado completo está anexado a este email.\n"
+            parts.append("O relatório detalhado completo está anexado a este email.\n")
         else:
-            text += "Não há mudanças para reportar nesta data.\n"
+            parts.append("Não há mudanças para reportar nesta data.\n")
         
-        text += f"{'=' * 80}\n"
-        text += """
+        parts.append(f"{'=' * 80}\n")
+        parts.append("""
 ---
 Relatório gerado automaticamente pelo sistema de monitoramento Zabbix
 Este é um email automático, não responda.
-"""
-        return text
+""")
+        return "".join(parts)
+    
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
@@ -3,29 +3,31 @@ Script principal para coletar hosts do Zabbix e gerar relatórios de mudanças.
 """
 import os
 import sys
+import functools
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
 import argparse
 
 from database import DatabaseManager
-from zabbix_collector import ZabbixCollector
-from comparator import HostComparator
-from report_generator import ReportGenerator
-from email_sender import EmailSender
-
-# Configuração de logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('zabbix_daily_report.log'),
-        logging.StreamHandler()
-    ]
-)
+
 logger = logging.getLogger(__name__)
 
 
+def setup_logging():
+    # Configurado apenas na execução direta, para não duplicar handlers
+    # quando o módulo é importado pelos agendadores
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('zabbix_daily_report.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+
+@functools.lru_cache(maxsize=1)
 def load_config():
     load_dotenv()
     
@@ -36,6 +38,7 @@ def load_config():
         'database_path': os.getenv('DATABASE_PATH', 'zabbix_hosts.db'),
         'reports_dir': os.getenv('REPORTS_DIR', 'reports'),
         'report_format': os.getenv('REPORT_FORMAT', 'both'),
+        'report_only_on_changes': os.getenv('REPORT_ONLY_ON_CHANGES', 'false').lower() == 'true',
         'send_email': os.getenv('SEND_EMAIL', 'false').lower() == 'true',
         'smtp_server': os.getenv('SMTP_SERVER', 'smtp.office365.com'),
         'smtp_port': int(os.getenv('SMTP_PORT', '587')),
@@ -64,58 +67,89 @@ def load_config():
     return config
 
 
-def collect_hosts(config):
-    logger.info("Iniciando coleta de hosts do Zabbix...")
+def reload_config():
+    """Descarta a configuração em cache e relê o arquivo .env."""
+    load_dotenv(override=True)
+    load_config.cache_clear()
+    logger.info("Configurações recarregadas do arquivo .env")
+
+
+def collect_hosts(config, db=None, force=False):
+    # Importado sob demanda: --action report não precisa do cliente Zabbix
+    from zabbix_collector import ZabbixCollector
     
-    with ZabbixCollector(
-        config['zabbix_url'],
-        config['zabbix_username'],
-        config['zabbix_password']
-    ) as collector:
-        hosts = collector.get_all_hosts()
+    logger.info("Iniciando coleta de hosts do Zabbix...")
     
-    db = DatabaseManager(config['database_path'])
+    # Sem banco compartilhado, a conexão vale só para esta coleta
+    owns_db = db is None
+    if owns_db:
+        db = DatabaseManager(config['database_path'])
     collection_date = datetime.now().strftime("%Y-%m-%d")
     
-    if db.check_date_exists(collection_date):
-        logger.warning(f"Já existe uma coleta para a data {collection_date}")
-        response = input("Deseja substituir? (s/n): ").lower()
-        if response != 's':
-            logger.info("Coleta cancelada pelo usuário")
-            return None
-    
-    db.save_hosts(hosts, collection_date)
+    try:
+        # Decide antes de consultar a API: uma coleta recusada não custa a busca no Zabbix
+        if db.check_date_exists(collection_date) and not force:
+            logger.warning(f"Já existe uma coleta para a data {collection_date}")
+            # Sem terminal (agendadores) não há quem responda: mantém a coleta existente
+            if not sys.stdin or not sys.stdin.isatty():
+                logger.info("Execução não interativa: coleta existente mantida (use --force para substituir)")
+                return None
+            response = input("Deseja substituir? (s/n): ").lower()
+            if response != 's':
+                logger.info("Coleta cancelada pelo usuário")
+                return None
+        
+        with ZabbixCollector(
+            config['zabbix_url'],
+            config['zabbix_username'],
+            config['zabbix_password']
+        ) as collector:
+            hosts = collector.get_all_hosts()
+        
+        db.save_hosts(hosts, collection_date)
+    finally:
+        if owns_db:
+            db.close()
     logger.info(f"Coleta concluída: {len(hosts)} hosts salvos para {collection_date}")
     
     return collection_date
 
 
-def generate_comparison_report(config, current_date=None, previous_date=None):
+def generate_comparison_report(config, current_date=None, previous_date=None,
+                               email_sender=None, db=None):
+    # Importados sob demanda: --action collect não gera relatório
+    from comparator import HostComparator
+    from report_generator import ReportGenerator
+    
     logger.info("Iniciando geração de relatório comparativo...")
     
-    db = DatabaseManager(config['database_path'])
+    owns_db = db is None
+    if owns_db:
+        db = DatabaseManager(config['database_path'])
     
     if current_date is None:
         current_date = datetime.now().strftime("%Y-%m-%d")
     
-    if previous_date is None:
-        all_dates = db.get_all_collection_dates()
-        if not all_dates:
-            logger.error("Nenhuma coleta encontrada no banco de dados")
-            return
+    try:
+        if previous_date is None:
+            previous_date = db.get_previous_collection_date(current_date)
+            if previous_date is None:
+                if db.get_latest_collection_date() is None:
+                    logger.error("Nenhuma coleta encontrada no banco de dados")
+                    return
+                logger.warning(f"Não há coleta anterior a {current_date} para comparação")
+                logger.info("Execute a coleta novamente amanhã para gerar comparações")
+                return
         
-        earlier_dates = [d for d in all_dates if d < current_date]
-        if not earlier_dates:
-            logger.warning(f"Não há coleta anterior a {current_date} para comparação")
-            logger.info("Execute a coleta novamente amanhã para gerar comparações")
-            return
+        logger.info(f"Comparando {current_date} com {previous_date}")
         
-        previous_date = earlier_dates[0]
-    
-    logger.info(f"Comparando {current_date} com {previous_date}")
-    
-    current_hosts = db.get_hosts_by_date(current_date)
-    previous_hosts = db.get_hosts_by_date(previous_date)
+        # As duas datas em uma única consulta
+        hosts_by_date = db.get_hosts_by_dates([current_date, previous_date])
+        current_hosts = hosts_by_date[current_date]
+        previous_hosts = hosts_by_date[previous_date]
+    finally:
+        if owns_db:
+            db.close()
     
     if not current_hosts:
         logger.error(f"Nenhum host encontrado para a data {current_date}")
@@ -127,6 +161,8 @@ def generate_comparison_report(config, current_date=None, previous_date=None):
     
     comparator = HostComparator()
     comparison = comparator.compare_hosts(current_hosts, previous_hosts)
+    # Ordena uma única vez para os relatórios HTML/texto e o email
+    comparator.sort_by_hostname(comparison)
     
     summary = comparator.get_summary(comparison)
     logger.info("=" * 60)
@@ -140,43 +176,49 @@ def generate_comparison_report(config, current_date=None, previous_date=None):
     logger.info(f"Variação líquida: {summary['net_change']:+d}")
     logger.info("=" * 60)
     
+    has_changes = comparator.has_changes(comparison)
+    if not has_changes and config.get('report_only_on_changes'):
+        logger.info("Nenhuma mudança detectada: relatório e email não gerados (REPORT_ONLY_ON_CHANGES=true)")
+        return
+    
     report_gen = ReportGenerator(config['reports_dir'])
     report_format = config['report_format'].lower()
     
-    report_files = []
-    
-    if report_format in ['html', 'both']:
-        html_path = report_gen.generate_html_report(comparison, current_date, previous_date)
-        logger.info(f"✅ Relatório HTML gerado: {html_path}")
-        report_files.append(html_path)
-    
-    if report_format in ['text', 'both']:
-        text_path = report_gen.generate_text_report(comparison, current_date, previous_date)
-        logger.info(f"✅ Relatório de texto gerado: {text_path}")
-        report_files.append(text_path)
+    report_files = report_gen.generate_reports(comparison, current_date, previous_date,
+                                               report_format, has_changes)
+    for report_path in report_files:
+        logger.info(f"✅ Relatório gerado: {report_path}")
     
     if config['send_email']:
         logger.info("=" * 60)
         logger.info("Enviando relatório por email...")
         
-        email_sender = EmailSender(
-            smtp_server=config['smtp_server'],
-            smtp_port=config['smtp_port'],
-            username=config['smtp_username'],
-            password=config['smtp_password'],
-            use_tls=config['smtp_use_tls']
-        )
+        # Sem remetente compartilhado, a conexão SMTP vale só para este envio
+        owns_sender = email_sender is None
+        if owns_sender:
+            from email_sender import EmailSender
+            email_sender = EmailSender(
+                smtp_server=config['smtp_server'],
+                smtp_port=config['smtp_port'],
+                username=config['smtp_username'],
+                password=config['smtp_password'],
+                use_tls=config['smtp_use_tls']
+            )
         
         attachments = report_files if config['email_attach_reports'] else None
         
-        success = email_sender.send_simple_report(
-            recipient_emails=config['email_recipients'],
-            report_date=current_date,
-            summary=summary,
-            has_changes=comparator.has_changes(comparison),
-            comparison=comparison,
-            report_files=attachments
-        )
+        try:
+            success = email_sender.send_simple_report(
+                recipient_emails=config['email_recipients'],
+                report_date=current_date,
+                summary=summary,
+                has_changes=has_changes,
+                comparison=comparison,
+                report_files=attachments
+            )
+        finally:
+            if owns_sender:
+                email_sender.close()
         
         if success:
             logger.info(f"📧 Email enviado para: {', '.join(config['email_recipients'])}")
@@ -205,23 +247,31 @@ def main():
         '--previous-date',
         help='Data anterior para comparação (formato: YYYY-MM-DD)'
     )
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Substitui uma coleta já existente para a data sem perguntar'
+    )
     
     args = parser.parse_args()
     
     try:
         config = load_config()
         
-        if args.action in ['collect', 'both']:
-            collection_date = collect_hosts(config)
-            if collection_date is None and args.action == 'collect':
-                return
-        
-        if args.action in ['report', 'both']:
-            generate_comparison_report(
-                config,
-                args.current_date,
-                args.previous_date
-            )
+        # Uma única conexão para a coleta e o relatório
+        with DatabaseManager(config['database_path']) as db:
+            if args.action in ['collect', 'both']:
+                collection_date = collect_hosts(config, db, force=args.force)
+                if collection_date is None and args.action == 'collect':
+                    return
+            
+            if args.action in ['report', 'both']:
+                generate_comparison_report(
+                    config,
+                    args.current_date,
+                    args.previous_date,
+                    db=db
+                )
         
         logger.info("Processo concluído com sucesso!")
         
@@ -234,4 +284,5 @@ def main():
 
 
 if __name__ == "__main__":
+    setup_logging()
     main()
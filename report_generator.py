@@ -1,155 +1,138 @@
 """
 Módulo para gerar relatórios de mudanças em hosts do Zabbix.
 """
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Iterator, List, Optional
 import logging
 import os
 
 logger = logging.getLogger(__name__)
 
+# Tabela de escape HTML montada uma única vez
+_HTML_ESCAPE = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'})
 
-class ReportGenerator:
-    def __init__(self, output_dir: str = "reports"):
-        self.output_dir = output_dir
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            logger.info(f"Diretório de relatórios criado: {output_dir}")
-    
-    def generate_html_report(self, comparison: Dict, current_date: str, 
-                            previous_date: str) -> str:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"zabbix_report_{current_date}_{timestamp}.html"
-        filepath = os.path.join(self.output_dir, filename)
-        
-        html_content = self._build_html_content(comparison, current_date, previous_date)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        logger.info(f"Relatório HTML gerado: {filepath}")
-        return filepath
-    
-    def generate_text_report(self, comparison: Dict, current_date: str, 
-                            previous_date: str) -> str:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"zabbix_report_{current_date}_{timestamp}.txt"
-        filepath = os.path.join(self.output_dir, filename)
-        
-        text_content = self._build_text_content(comparison, current_date, previous_date)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(text_content)
-        
-        logger.info(f"Relatório de texto gerado: {filepath}")
-        return filepath
-    
-    def _build_html_content(self, comparison: Dict, current_date: str, 
-                           previous_date: str) -> str:
-        
-        has_changes = (len(comparison['added']) > 0 or 
-                      len(comparison['removed']) > 0 or 
-                      len(comparison['modified']) > 0)
-        
-        html = f"""<!DOCTYPE html>
+
+def _escape(value) -> str:
+    return str(value).translate(_HTML_ESCAPE)
+
+
+def _has_changes(comparison: Dict) -> bool:
+    return bool(comparison['added'] or comparison['removed'] or comparison['modified'])
+
+
+# Campos exibidos para hosts modificados:
+# (flag, rótulo, chave antiga, chave nova, largura máxima no relatório texto)
+_MODIFIED_FIELDS = (
+    ('ip_changed', 'IP', 'old_ip', 'new_ip', None),
+    ('groups_changed', 'Grupos', 'old_groups', 'new_groups', 30),
+    ('templates_changed', 'Templates', 'old_templates', 'new_templates', 30),
+)
+
+# Partes fixas do relatório HTML, montadas uma única vez na carga do módulo
+_HTML_DOC_START_TMPL = """<!DOCTYPE html>
 <html lang="pt-BR">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Relatório de Hosts Zabbix - {current_date}</title>
-    <style>
-        body {{
+"""
+
+_HTML_HEAD = """    <style>
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             margin: 20px;
             background-color: #f5f5f5;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 1200px;
             margin: 0 auto;
             background-color: white;
             padding: 30px;
             border-radius: 8px;
             box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        h1 {{
+        }
+        h1 {
             color: #333;
             border-bottom: 3px solid #007bff;
             padding-bottom: 10px;
-        }}
-        h2 {{
+        }
+        h2 {
             color: #555;
             margin-top: 30px;
-        }}
-        .summary {{
+        }
+        .summary {
             background-color: #e9ecef;
             padding: 20px;
             border-radius: 5px;
             margin: 20px 0;
-        }}
-        .summary-item {{
+        }
+        .summary-item {
             display: inline-block;
             margin: 10px 20px 10px 0;
             font-size: 16px;
-        }}
-        .summary-label {{
+        }
+        .summary-label {
             font-weight: bold;
             color: #666;
-        }}
-        .summary-value {{
+        }
+        .summary-value {
             color: #007bff;
             font-size: 20px;
             font-weight: bold;
-        }}
-        table {{
+        }
+        table {
             width: 100%;
             border-collapse: collapse;
             margin: 20px 0;
-        }}
-        th {{
+        }
+        th {
             background-color: #007bff;
             color: white;
             padding: 12px;
             text-align: left;
-        }}
-        td {{
+        }
+        td {
             padding: 10px;
             border-bottom: 1px solid #ddd;
-        }}
-        tr:hover {{
+        }
+        tr:hover {
             background-color: #f8f9fa;
-        }}
-        .added {{
+        }
+        .added {
             background-color: #d4edda;
-        }}
-        .removed {{
+        }
+        .removed {
             background-color: #f8d7da;
-        }}
-        .modified {{
+        }
+        .modified {
             background-color: #fff3cd;
-        }}
-        .no-changes {{
+        }
+        .no-changes {
             background-color: #d1ecf1;
             padding: 20px;
             border-radius: 5px;
             text-align: center;
             color: #0c5460;
             font-size: 18px;
-        }}
-        .footer {{
+        }
+        .footer {
             margin-top: 40px;
             padding-top: 20px;
             border-top: 1px solid #ddd;
             text-align: center;
             color: #666;
             font-size: 14px;
-        }}
+        }
     </style>
 </head>
 <body>
     <div class="container">
         <h1>📊 Relatório de Mudanças em Hosts Zabbix</h1>
         
-        <div class="summary">
+"""
+
+_HTML_SUMMARY_TMPL = """        <div class="summary">
             <div class="summary-item">
                 <span class="summary-label">Data Atual:</span>
                 <span class="summary-value">{current_date}</span>
@@ -161,60 +144,36 @@ class ReportGenerator:
             <br>
             <div class="summary-item">
                 <span class="summary-label">Total Atual:</span>
-                <span class="summary-value">{comparison['total_current']}</span>
+                <span class="summary-value">{total_current}</span>
             </div>
             <div class="summary-item">
                 <span class="summary-label">Total Anterior:</span>
-                <span class="summary-value">{comparison['total_previous']}</span>
+                <span class="summary-value">{total_previous}</span>
             </div>
             <div class="summary-item">
                 <span class="summary-label">Variação:</span>
-                <span class="summary-value">{comparison['total_current'] - comparison['total_previous']:+d}</span>
+                <span class="summary-value">{net_change:+d}</span>
             </div>
         </div>
 """
-        
-        if not has_changes:
-            html += """
+
+_HTML_NO_CHANGES = """
         <div class="no-changes">
             ✅ Nenhuma mudança detectada entre as datas comparadas.
         </div>
 """
-        else:
-            if comparison['added']:
-                html += f"""
-        <h2>✅ Hosts Adicionados ({len(comparison['added'])})</h2>
-        <table>
-            <thead>
-                <tr>
-                    <th>ID</th>
-                    <th>Nome do Host</th>
-                    <th>Endereço IP</th>
-                    <th>Grupos</th>
-                    <th>Templates</th>
-                </tr>
-            </thead>
-            <tbody>
-"""
-                for host in sorted(comparison['added'], key=lambda x: x['hostname']):
-                    templates = host.get('templates', 'N/A')
-                    html += f"""
-                <tr class="added">
-                    <td>{host['host_id']}</td>
-                    <td>{host['hostname']}</td>
-                    <td>{host['ip_address']}</td>
-                    <td>{host['host_groups']}</td>
-                    <td>{templates}</td>
-                </tr>
-"""
-                html += """
-            </tbody>
-        </table>
+
+_HTML_FOOTER_TMPL = """
+        <div class="footer">
+            Relatório gerado em {generated_at}
+        </div>
+    </div>
+</body>
+</html>
 """
-            
-            if comparison['removed']:
-                html += f"""
-        <h2>❌ Hosts Removidos ({len(comparison['removed'])})</h2>
+
+_HTML_HOST_TABLE_HEAD = """
+        <h2>{title} ({count})</h2>
         <table>
             <thead>
                 <tr>
@@ -227,25 +186,19 @@ class ReportGenerator:
             </thead>
             <tbody>
 """
-                for host in sorted(comparison['removed'], key=lambda x: x['hostname']):
-                    templates = host.get('templates', 'N/A')
-                    html += f"""
-                <tr class="removed">
-                    <td>{host['host_id']}</td>
-                    <td>{host['hostname']}</td>
-                    <td>{host['ip_address']}</td>
-                    <td>{host['host_groups']}</td>
+
+_HTML_HOST_ROW = """
+                <tr class="{row_class}">
+                    <td>{host_id}</td>
+                    <td>{hostname}</td>
+                    <td>{ip_address}</td>
+                    <td>{host_groups}</td>
                     <td>{templates}</td>
                 </tr>
 """
-                html += """
-            </tbody>
-        </table>
-"""
-            
-            if comparison['modified']:
-                html += f"""
-        <h2>🔄 Hosts Modificados ({len(comparison['modified'])})</h2>
+
+_HTML_MODIFIED_TABLE_HEAD = """
+        <h2>🔄 Hosts Modificados ({count})</h2>
         <table>
             <thead>
                 <tr>
@@ -258,130 +211,227 @@ class ReportGenerator:
             </thead>
             <tbody>
 """
-                for host in sorted(comparison['modified'], key=lambda x: x['hostname']):
-                    if host.get('ip_changed'):
-                        html += f"""
-                <tr class="modified">
-                    <td>{host['host_id']}</td>
-                    <td>{host['hostname']}</td>
-                    <td>IP</td>
-                    <td>{host['old_ip']}</td>
-                    <td>{host['new_ip']}</td>
-                </tr>
-"""
-                    if host.get('groups_changed'):
-                        html += f"""
-                <tr class="modified">
-                    <td>{host['host_id']}</td>
-                    <td>{host['hostname']}</td>
-                    <td>Grupos</td>
-                    <td>{host['old_groups']}</td>
-                    <td>{host['new_groups']}</td>
-                </tr>
-"""
-                    if host.get('templates_changed'):
-                        html += f"""
+
+_HTML_MODIFIED_ROW = """
                 <tr class="modified">
-                    <td>{host['host_id']}</td>
-                    <td>{host['hostname']}</td>
-                    <td>Templates</td>
-                    <td>{host.get('old_templates', 'N/A')}</td>
-                    <td>{host.get('new_templates', 'N/A')}</td>
+                    <td>{host_id}</td>
+                    <td>{hostname}</td>
+                    <td>{label}</td>
+                    <td>{old}</td>
+                    <td>{new}</td>
                 </tr>
 """
-                html += """
+
+_HTML_TABLE_END = """
             </tbody>
         </table>
 """
+
+# A precisão (.24) trunca e o alinhamento completa com espaços na mesma formatação
+_TEXT_HOST_ROW = "{host_id:<12} {hostname:<25.24} {ip_address:<15} {host_groups:<25.24}\n"
+_TEXT_MODIFIED_ROW = "{host_id:<15} {hostname:<30} {label:<15} {old:<30} {new:<30}\n"
+
+# Buffer de escrita dos relatórios (1 MiB): poucos write() mesmo com milhares de linhas
+_WRITE_BUFFER_SIZE = 1 << 20
+
+
+class ReportGenerator:
+    """Gera relatórios HTML e texto a partir de uma comparação já ordenada por hostname
+    (ver HostComparator.sort_by_hostname)."""
+    
+    def __init__(self, output_dir: str = "reports"):
+        self.output_dir = output_dir
+        # Uma única chamada, sem a corrida entre exists() e makedirs()
+        try:
+            os.makedirs(output_dir)
+        except FileExistsError:
+            pass
+        else:
+            logger.info(f"Diretório de relatórios criado: {output_dir}")
+    
+    def generate_reports(self, comparison: Dict, current_date: str, previous_date: str,
+                         report_format: str = 'both',
+                         has_changes: Optional[bool] = None,
+                         label: Optional[str] = None) -> List[str]:
+        """Gera os relatórios do formato pedido ('html', 'text' ou 'both').
         
-        html += f"""
-        <div class="footer">
-            Relatório gerado em {datetime.now().strftime("%d/%m/%Y às %H:%M:%S")}
-        </div>
-    </div>
-</body>
-</html>
-"""
+        Com 'both', HTML e texto são gerados em paralelo e compartilham o mesmo
+        timestamp no nome do arquivo. label (ex.: 'semanal') entra no nome do
+        arquivo, para que relatórios de período gerados juntos não se sobrescrevam.
+        Retorna os caminhos na ordem HTML, texto.
+        """
+        now = datetime.now()
+        if has_changes is None:
+            has_changes = _has_changes(comparison)
+        generators = []
+        if report_format in ['html', 'both']:
+            generators.append(self.generate_html_report)
+        if report_format in ['text', 'both']:
+            generators.append(self.generate_text_report)
+        
+        if len(generators) < 2:
+            return [generate(comparison, current_date, previous_date, now, has_changes, label)
+                    for generate in generators]
         
-        return html
+        with ThreadPoolExecutor(max_workers=len(generators)) as executor:
+            futures = [executor.submit(generate, comparison, current_date, previous_date,
+                                       now, has_changes, label)
+                       for generate in generators]
+            return [future.result() for future in futures]
     
-    def _build_text_content(self, comparison: Dict, current_date: str, 
-                           previous_date: str) -> str:
+    def generate_html_report(self, comparison: Dict, current_date: str, 
+                            previous_date: str, now: Optional[datetime] = None,
+                            has_changes: Optional[bool] = None,
+                            label: Optional[str] = None) -> str:
+        if now is None:
+            now = datetime.now()
+        if has_changes is None:
+            has_changes = _has_changes(comparison)
+        filepath = self._report_path(current_date, now, label, 'html')
         
-        lines = []
-        lines.append("=" * 80)
-        lines.append("RELATÓRIO DE MUDANÇAS EM HOSTS ZABBIX")
-        lines.append("=" * 80)
-        lines.append(f"\nData da Comparação: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-        lines.append(f"Data Atual: {current_date}")
-        lines.append(f"Data Anterior: {previous_date}")
-        lines.append("\n" + "-" * 80)
-        lines.append("RESUMO")
-        lines.append("-" * 80)
-        lines.append(f"Total de Hosts Atual: {comparison['total_current']}")
-        lines.append(f"Total de Hosts Anterior: {comparison['total_previous']}")
-        lines.append(f"Variação: {comparison['total_current'] - comparison['total_previous']:+d}")
-        lines.append(f"\nHosts Adicionados: {len(comparison['added'])}")
-        lines.append(f"Hosts Removidos: {len(comparison['removed'])}")
-        lines.append(f"Hosts Modificados (IP): {len(comparison['modified'])}")
+        # Os fragmentos vão direto para o arquivo, sem montar o relatório inteiro em memória
+        with open(filepath, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE) as f:
+            f.writelines(self._iter_html_fragments(comparison, current_date, previous_date,
+                                                   now, has_changes))
         
-        has_changes = (len(comparison['added']) > 0 or 
-                      len(comparison['removed']) > 0 or 
-                      len(comparison['modified']) > 0)
+        logger.info(f"Relatório HTML gerado: {filepath}")
+        return filepath
+    
+    def generate_text_report(self, comparison: Dict, current_date: str, 
+                            previous_date: str, now: Optional[datetime] = None,
+                            has_changes: Optional[bool] = None,
+                            label: Optional[str] = None) -> str:
+        if now is None:
+            now = datetime.now()
+        if has_changes is None:
+            has_changes = _has_changes(comparison)
+        filepath = self._report_path(current_date, now, label, 'txt')
+        
+        with open(filepath, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE) as f:
+            f.writelines(self._iter_text_fragments(comparison, current_date, previous_date,
+                                                   now, has_changes))
+        
+        logger.info(f"Relatório de texto gerado: {filepath}")
+        return filepath
+    
+    def _report_path(self, current_date: str, now: datetime, label: Optional[str],
+                     extension: str) -> str:
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        prefix = f"zabbix_report_{label}_" if label else "zabbix_report_"
+        return os.path.join(self.output_dir, f"{prefix}{current_date}_{timestamp}.{extension}")
+    
+    def _iter_html_fragments(self, comparison: Dict, current_date: str, previous_date: str,
+                             now: datetime, has_changes: bool) -> Iterator[str]:
+        yield _HTML_DOC_START_TMPL.format(current_date=current_date)
+        yield _HTML_HEAD
+        yield _HTML_SUMMARY_TMPL.format(
+            current_date=current_date,
+            previous_date=previous_date,
+            total_current=comparison['total_current'],
+            total_previous=comparison['total_previous'],
+            net_change=comparison['total_current'] - comparison['total_previous']
+        )
         
         if not has_changes:
-            lines.append("\n" + "=" * 80)
-            lines.append("✅ NENHUMA MUDANÇA DETECTADA")
-            lines.append("=" * 80)
+            yield _HTML_NO_CHANGES
         else:
-            if comparison['added']:
-                lines.append("\n" + "=" * 80)
-                lines.append(f"HOSTS ADICIONADOS ({len(comparison['added'])})")
-                lines.append("=" * 80)
-                lines.append(f"{'ID':<12} {'Nome':<25} {'IP':<15} {'Grupos':<25}")
-                lines.append("-" * 80)
-                for host in sorted(comparison['added'], key=lambda x: x['hostname']):
-                    hostname = host['hostname'][:24] if len(host['hostname']) > 24 else host['hostname']
-                    groups = host['host_groups'][:24] if len(host['host_groups']) > 24 else host['host_groups']
-                    lines.append(f"{host['host_id']:<12} {hostname:<25} {host['ip_address']:<15} {groups:<25}")
-                    templates = host.get('templates', 'N/A')
-                    if templates != 'N/A':
-                        lines.append(f"             Templates: {templates}")
+            for key, title, row_class in (('added', '✅ Hosts Adicionados', 'added'),
+                                          ('removed', '❌ Hosts Removidos', 'removed')):
+                hosts = comparison[key]
+                if not hosts:
+                    continue
+                yield _HTML_HOST_TABLE_HEAD.format(title=title, count=len(hosts))
+                for host in hosts:
+                    yield _HTML_HOST_ROW.format(
+                        row_class=row_class,
+                        host_id=_escape(host['host_id']),
+                        hostname=_escape(host['hostname']),
+                        ip_address=_escape(host['ip_address']),
+                        host_groups=_escape(host['host_groups']),
+                        templates=_escape(host.get('templates', 'N/A'))
+                    )
+                yield _HTML_TABLE_END
             
-            if comparison['removed']:
-                lines.append("\n" + "=" * 80)
-                lines.append(f"HOSTS REMOVIDOS ({len(comparison['removed'])})")
-                lines.append("=" * 80)
-                lines.append(f"{'ID':<12} {'Nome':<25} {'IP':<15} {'Grupos':<25}")
-                lines.append("-" * 80)
-                for host in sorted(comparison['removed'], key=lambda x: x['hostname']):
-                    hostname = host['hostname'][:24] if len(host['hostname']) > 24 else host['hostname']
-                    groups = host['host_groups'][:24] if len(host['host_groups']) > 24 else host['host_groups']
-                    lines.append(f"{host['host_id']:<12} {hostname:<25} {host['ip_address']:<15} {groups:<25}")
+            if comparison['modified']:
+                yield _HTML_MODIFIED_TABLE_HEAD.format(count=len(comparison['modified']))
+                for host in comparison['modified']:
+                    for flag, label, old_key, new_key, _ in _MODIFIED_FIELDS:
+                        if host.get(flag):
+                            yield _HTML_MODIFIED_ROW.format(
+                                host_id=_escape(host['host_id']),
+                                hostname=_escape(host['hostname']),
+                                label=label,
+                                old=_escape(host.get(old_key, 'N/A')),
+                                new=_escape(host.get(new_key, 'N/A'))
+                            )
+                yield _HTML_TABLE_END
+        
+        yield _HTML_FOOTER_TMPL.format(
+            generated_at=now.strftime("%d/%m/%Y às %H:%M:%S")
+        )
+    
+    def _iter_text_fragments(self, comparison: Dict, current_date: str, previous_date: str,
+                             now: datetime, has_changes: bool) -> Iterator[str]:
+        generated_at = now.strftime('%d/%m/%Y %H:%M:%S')
+        
+        yield "=" * 80 + "\n"
+        yield "RELATÓRIO DE MUDANÇAS EM HOSTS ZABBIX\n"
+        yield "=" * 80 + "\n"
+        yield f"\nData da Comparação: {generated_at}\n"
+        yield f"Data Atual: {current_date}\n"
+        yield f"Data Anterior: {previous_date}\n"
+        yield "\n" + "-" * 80 + "\n"
+        yield "RESUMO\n"
+        yield "-" * 80 + "\n"
+        yield f"Total de Hosts Atual: {comparison['total_current']}\n"
+        yield f"Total de Hosts Anterior: {comparison['total_previous']}\n"
+        yield f"Variação: {comparison['total_current'] - comparison['total_previous']:+d}\n"
+        yield f"\nHosts Adicionados: {len(comparison['added'])}\n"
+        yield f"Hosts Removidos: {len(comparison['removed'])}\n"
+        yield f"Hosts Modificados (IP): {len(comparison['modified'])}\n"
+        
+        if not has_changes:
+            yield "\n" + "=" * 80 + "\n"
+            yield "✅ NENHUMA MUDANÇA DETECTADA\n"
+            yield "=" * 80 + "\n"
+        else:
+            for key, title in (('added', 'HOSTS ADICIONADOS'), ('removed', 'HOSTS REMOVIDOS')):
+                hosts = comparison[key]
+                if not hosts:
+                    continue
+                yield "\n" + "=" * 80 + "\n"
+                yield f"{title} ({len(hosts)})\n"
+                yield "=" * 80 + "\n"
+                yield f"{'ID':<12} {'Nome':<25} {'IP':<15} {'Grupos':<25}\n"
+                yield "-" * 80 + "\n"
+                for host in hosts:
+                    yield _TEXT_HOST_ROW.format(
+                        host_id=host['host_id'],
+                        hostname=host['hostname'],
+                        ip_address=host['ip_address'],
+                        host_groups=host['host_groups']
+                    )
                     templates = host.get('templates', 'N/A')
                     if templates != 'N/A':
-                        lines.append(f"             Templates: {templates}")
+                        yield f"             Templates: {templates}\n"
             
             if comparison['modified']:
-                lines.append("\n" + "=" * 80)
-                lines.append(f"HOSTS MODIFICADOS ({len(comparison['modified'])})")
-                lines.append("=" * 80)
-                lines.append(f"{'ID':<15} {'Nome do Host':<30} {'Campo':<15} {'Valor Anterior':<30} {'Valor Atual':<30}")
-                lines.append("-" * 80)
-                for host in sorted(comparison['modified'], key=lambda x: x['hostname']):
-                    if host.get('ip_changed'):
-                        lines.append(f"{host['host_id']:<15} {host['hostname']:<30} {'IP':<15} {host['old_ip']:<30} {host['new_ip']:<30}")
-                    if host.get('groups_changed'):
-                        old_groups = host['old_groups'][:30] if len(host['old_groups']) > 30 else host['old_groups']
-                        new_groups = host['new_groups'][:30] if len(host['new_groups']) > 30 else host['new_groups']
-                        lines.append(f"{host['host_id']:<15} {host['hostname']:<30} {'Grupos':<15} {old_groups:<30} {new_groups:<30}")
-                    if host.get('templates_changed'):
-                        old_templates = host.get('old_templates', 'N/A')[:30] if len(host.get('old_templates', 'N/A')) > 30 else host.get('old_templates', 'N/A')
-                        new_templates = host.get('new_templates', 'N/A')[:30] if len(host.get('new_templates', 'N/A')) > 30 else host.get('new_templates', 'N/A')
-                        lines.append(f"{host['host_id']:<15} {host['hostname']:<30} {'Templates':<15} {old_templates:<30} {new_templates:<30}")
-        
-        lines.append("\n" + "=" * 80)
-        lines.append(f"Fim do Relatório - Gerado em {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}")
-        lines.append("=" * 80)
+                yield "\n" + "=" * 80 + "\n"
+                yield f"HOSTS MODIFICADOS ({len(comparison['modified'])})\n"
+                yield "=" * 80 + "\n"
+                yield f"{'ID':<15} {'Nome do Host':<30} {'Campo':<15} {'Valor Anterior':<30} {'Valor Atual':<30}\n"
+                yield "-" * 80 + "\n"
+                for host in comparison['modified']:
+                    for flag, label, old_key, new_key, width in _MODIFIED_FIELDS:
+                        if host.get(flag):
+                            yield _TEXT_MODIFIED_ROW.format(
+                                host_id=host['host_id'],
+                                hostname=host['hostname'],
+                                label=label,
+                                old=host.get(old_key, 'N/A')[:width],
+                                new=host.get(new_key, 'N/A')[:width]
+                            )
         
-        return "\n".join(lines)
+        yield "\n" + "=" * 80 + "\n"
+        yield f"Fim do Relatório - Gerado em {generated_at}\n"
+        yield "=" * 80
@@ -3,10 +3,12 @@ Script para agendar execução diária automática.
 Executa a coleta e geração de relatório todos os dias em horário específico.
 """
 import schedule
+import signal
 import time
 import logging
 from datetime import datetime
-from main import load_config, collect_hosts, generate_comparison_report
+from main import load_config, reload_config, collect_hosts, generate_comparison_report
+from database import DatabaseManager
 
 logging.basicConfig(
     level=logging.INFO,
@@ -18,6 +20,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Limite de espera entre verificações, em segundos
+MAX_IDLE_SECONDS = 3600
+
 
 def daily_job():
     logger.info("=" * 80)
@@ -27,16 +32,17 @@ def daily_job():
     try:
         config = load_config()
         
-        logger.info("Etapa 1: Coletando hosts do Zabbix...")
-        collection_date = collect_hosts(config)
-        
-        if collection_date:
-            logger.info("Etapa 2: Gerando relatório comparativo...")
-            generate_comparison_report(config)
+        with DatabaseManager(config['database_path']) as db:
+            logger.info("Etapa 1: Coletando hosts do Zabbix...")
+            collection_date = collect_hosts(config, db)
             
-            logger.info("✅ Job diário concluído com sucesso!")
-        else:
-            logger.warning("⚠️ Coleta não foi realizada, relatório não gerado")
+            if collection_date:
+                logger.info("Etapa 2: Gerando relatório comparativo...")
+                generate_comparison_report(config, db=db)
+                
+                logger.info("✅ Job diário concluído com sucesso!")
+            else:
+                logger.warning("⚠️ Coleta não foi realizada, relatório não gerado")
             
     except Exception as e:
         logger.error(f"❌ Erro durante execução do job diário: {e}", exc_info=True)
@@ -56,6 +62,10 @@ def main():
     
     schedule.every().day.at(EXECUTION_TIME).do(daily_job)
     
+    # load_config() fica em cache entre execuções; SIGHUP relê o .env
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, lambda signum, frame: reload_config())
+    
     logger.info("Deseja executar o job imediatamente? (s/n): ", )
     try:
         response = input().lower()
@@ -67,10 +77,15 @@ def main():
     
     logger.info(f"\nAgendador ativo. Próxima execução: {schedule.next_run()}")
     
+    # Dorme até o próximo job em vez de acordar a cada minuto
     try:
         while True:
             schedule.run_pending()
-            time.sleep(60) 
+            idle = schedule.idle_seconds()
+            if idle is None:
+                break
+            if idle > 0:
+                time.sleep(min(idle, MAX_IDLE_SECONDS))
             
     except KeyboardInterrupt:
         logger.info("\n" + "=" * 80)
@@ -2,6 +2,8 @@
 Script de teste para verificar configuração de envio de email.
 """
 import sys
+import functools
+from types import SimpleNamespace
 from dotenv import load_dotenv
 import os
 from email_sender import EmailSender
@@ -13,6 +15,87 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Dados fictícios do email de teste (montados uma única vez, já em ordem de hostname)
+_TEST_SUMMARY = {
+    'hosts_added': 5,
+    'hosts_removed': 2,
+    'hosts_modified': 3,
+    'total_current': 150,
+    'total_previous': 147,
+    'net_change': 3
+}
+
+_TEST_COMPARISON = {
+    'added': [
+        {'host_id': '10005', 'hostname': 'firewall-01', 'ip_address': '192.168.0.1', 'host_groups': 'Network, Security'},
+        {'host_id': '10003', 'hostname': 'server-app-01', 'ip_address': '192.168.1.30', 'host_groups': 'Linux Servers, Application'},
+        {'host_id': '10002', 'hostname': 'server-db-01', 'ip_address': '192.168.1.20', 'host_groups': 'Linux Servers, Database'},
+        {'host_id': '10001', 'hostname': 'server-web-01', 'ip_address': '192.168.1.10', 'host_groups': 'Linux Servers, Web'},
+        {'host_id': '10004', 'hostname': 'workstation-01', 'ip_address': '192.168.2.100', 'host_groups': 'Windows, Workstations'},
+    ],
+    'removed': [
+        {'host_id': '9001', 'hostname': 'old-server-01', 'ip_address': '192.168.1.99', 'host_groups': 'Deprecated, Linux Servers'},
+        {'host_id': '9002', 'hostname': 'test-machine', 'ip_address': '192.168.3.50', 'host_groups': 'Test Environment'},
+    ],
+    'modified': [
+        {
+            'host_id': '8003',
+            'hostname': 'router-main',
+            'old_ip': '10.0.0.1',
+            'new_ip': '10.0.0.254',
+            'old_groups': 'Network',
+            'new_groups': 'Network',
+            'ip_changed': True,
+            'groups_changed': False
+        },
+        {
+            'host_id': '8002',
+            'hostname': 'server-db-02',
+            'old_ip': '192.168.1.21',
+            'new_ip': '192.168.1.21',
+            'old_groups': 'Linux Servers',
+            'new_groups': 'Linux Servers, Database',
+            'ip_changed': False,
+            'groups_changed': True
+        },
+        {
+            'host_id': '8001',
+            'hostname': 'server-web-02',
+            'old_ip': '192.168.1.11',
+            'new_ip': '192.168.1.15',
+            'old_groups': 'Linux Servers',
+            'new_groups': 'Linux Servers, Web',
+            'ip_changed': True,
+            'groups_changed': True
+        }
+    ],
+    'total_current': 150,
+    'total_previous': 147
+}
+
+# Configurações obrigatórias: (atributo em _load_config(), variável do .env, o que configurar)
+_REQUIRED_SETTINGS = (
+    ('smtp_username', 'SMTP_USERNAME', 'seu email'),
+    ('smtp_password', 'SMTP_PASSWORD', 'sua senha'),
+    ('email_recipients', 'EMAIL_RECIPIENTS', 'os destinatários'),
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_config():
+    """Lê o .env uma única vez e já converte os valores SMTP."""
+    load_dotenv()
+    
+    recipients = os.getenv('EMAIL_RECIPIENTS')
+    return SimpleNamespace(
+        smtp_server=os.getenv('SMTP_SERVER', 'smtp.office365.com'),
+        smtp_port=int(os.getenv('SMTP_PORT', '587')),
+        smtp_username=os.getenv('SMTP_USERNAME'),
+        smtp_password=os.getenv('SMTP_PASSWORD'),
+        smtp_use_tls=os.getenv('SMTP_USE_TLS', 'true').lower() == 'true',
+        email_recipients=tuple(email.strip() for email in recipients.split(',')) if recipients else ()
+    )
+
 
 def test_email():
     print("=" * 70)
@@ -20,14 +103,13 @@ def test_email():
     print("=" * 70)
     print()
     
-    load_dotenv()
-    
-    smtp_server = os.getenv('SMTP_SERVER', 'smtp.office365.com')
-    smtp_port = int(os.getenv('SMTP_PORT', '587'))
-    smtp_username = os.getenv('SMTP_USERNAME')
-    smtp_password = os.getenv('SMTP_PASSWORD')
-    smtp_use_tls = os.getenv('SMTP_USE_TLS', 'true').lower() == 'true'
-    email_recipients = os.getenv('EMAIL_RECIPIENTS', '').split(',') if os.getenv('EMAIL_RECIPIENTS') else []
+    config = _load_config()
+    smtp_server = config.smtp_server
+    smtp_port = config.smtp_port
+    smtp_username = config.smtp_username
+    smtp_password = config.smtp_password
+    smtp_use_tls = config.smtp_use_tls
+    email_recipients = config.email_recipients
     
     print("📋 Configurações carregadas:")
     print(f"   Servidor SMTP: {smtp_server}")
@@ -37,20 +119,11 @@ def test_email():
     print(f"   Destinatários: {', '.join(email_recipients) if email_recipients else 'Nenhum'}")
     print()
     
-    if not smtp_username:
-        print("❌ ERRO: SMTP_USERNAME não configurado no arquivo .env")
-        print("   Configure seu email em SMTP_USERNAME")
-        return False
-    
-    if not smtp_password:
-        print("❌ ERRO: SMTP_PASSWORD não configurado no arquivo .env")
-        print("   Configure sua senha em SMTP_PASSWORD")
-        return False
-    
-    if not email_recipients:
-        print("❌ ERRO: EMAIL_RECIPIENTS não configurado no arquivo .env")
-        print("   Configure os destinatários em EMAIL_RECIPIENTS")
-        return False
+    for attr, env_var, hint in _REQUIRED_SETTINGS:
+        if not getattr(config, attr):
+            print(f"❌ ERRO: {env_var} não configurado no arquivo .env")
+            print(f"   Configure {hint} em {env_var}")
+            return False
     
     print("-" * 70)
     print("🔍 Validação: OK")
@@ -59,7 +132,7 @@ def test_email():
     
     print("📧 Email de teste será enviado para:")
     for email in email_recipients:
-        print(f"   • {email.strip()}")
+        print(f"   • {email}")
     print()
     
     response = input("Deseja continuar com o teste? (s/n): ").lower()
@@ -74,79 +147,22 @@ def test_email():
     print()
     
     try:
-        email_sender = EmailSender(
+        # A sessão SMTP fica aberta até close(): o with encerra com QUIT
+        with EmailSender(
             smtp_server=smtp_server,
             smtp_port=smtp_port,
             username=smtp_username,
             password=smtp_password,
             use_tls=smtp_use_tls
-        )
-        
-        summary = {
-            'hosts_added': 5,
-            'hosts_removed': 2,
-            'hosts_modified': 3,
-            'total_current': 150,
-            'total_previous': 147,
-            'net_change': 3
-        }
-        
-        comparison = {
-            'added': [
-                {'host_id': '10001', 'hostname': 'server-web-01', 'ip_address': '192.168.1.10', 'host_groups': 'Linux Servers, Web'},
-                {'host_id': '10002', 'hostname': 'server-db-01', 'ip_address': '192.168.1.20', 'host_groups': 'Linux Servers, Database'},
-                {'host_id': '10003', 'hostname': 'server-app-01', 'ip_address': '192.168.1.30', 'host_groups': 'Linux Servers, Application'},
-                {'host_id': '10004', 'hostname': 'workstation-01', 'ip_address': '192.168.2.100', 'host_groups': 'Windows, Workstations'},
-                {'host_id': '10005', 'hostname': 'firewall-01', 'ip_address': '192.168.0.1', 'host_groups': 'Network, Security'},
-            ],
-            'removed': [
-                {'host_id': '9001', 'hostname': 'old-server-01', 'ip_address': '192.168.1.99', 'host_groups': 'Deprecated, Linux Servers'},
-                {'host_id': '9002', 'hostname': 'test-machine', 'ip_address': '192.168.3.50', 'host_groups': 'Test Environment'},
-            ],
-            'modified': [
-                {
-                    'host_id': '8001',
-                    'hostname': 'server-web-02',
-                    'old_ip': '192.168.1.11',
-                    'new_ip': '192.168.1.15',
-                    'old_groups': 'Linux Servers',
-                    'new_groups': 'Linux Servers, Web',
-                    'ip_changed': True,
-                    'groups_changed': True
-                },
-                {
-                    'host_id': '8002',
-                    'hostname': 'server-db-02',
-                    'old_ip': '192.168.1.21',
-                    'new_ip': '192.168.1.21',
-                    'old_groups': 'Linux Servers',
-                    'new_groups': 'Linux Servers, Database',
-                    'ip_changed': False,
-                    'groups_changed': True
-                },
-                {
-                    'host_id': '8003',
-                    'hostname': 'router-main',
-                    'old_ip': '10.0.0.1',
-                    'new_ip': '10.0.0.254',
-                    'old_groups': 'Network',
-                    'new_groups': 'Network',
-                    'ip_changed': True,
-                    'groups_changed': False
-                }
-            ],
-            'total_current': 150,
-            'total_previous': 147
-        }
-        
-        success = email_sender.send_simple_report(
-            recipient_emails=[email.strip() for email in email_recipients],
-            report_date="2025-10-21 (TESTE)",
-            summary=summary,
-            has_changes=True,
-            comparison=comparison,
-            report_files=None
-        )
+        ) as email_sender:
+            success = email_sender.send_simple_report(
+                recipient_emails=list(email_recipients),
+                report_date="2025-10-21 (TESTE)",
+                summary=_TEST_SUMMARY,
+                has_changes=True,
+                comparison=_TEST_COMPARISON,
+                report_files=None
+            )
         
         print()
         print("=" * 70)
@@ -155,7 +171,7 @@ def test_email():
             print()
             print("📬 Verifique a caixa de entrada dos destinatários:")
             for email in email_recipients:
-                print(f"   • {email.strip()}")
+                print(f"   • {email}")
             print()
             print("💡 Dica: Se não recebeu, verifique a pasta de SPAM/Lixo Eletrônico")
         else:
@@ -1,6 +1,7 @@
 """
 Script para testar manualmente os jobs do agendador.
 """
+from concurrent.futures import ThreadPoolExecutor
 from auto_scheduler import daily_job, weekly_job, monthly_job
 
 print("=" * 80)
@@ -26,11 +27,13 @@ elif choice == "3":
     monthly_job()
 elif choice == "4":
     print("\n🔄 Executando todos os jobs...\n")
+    # O job diário grava a coleta usada pelos relatórios de período, então roda primeiro;
+    # semanal e mensal são independentes entre si e rodam em paralelo
     daily_job()
     print("\n")
-    weekly_job()
-    print("\n")
-    monthly_job()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for future in [executor.submit(weekly_job), executor.submit(monthly_job)]:
+            future.result()
 else:
     print("\n❌ Opção inválida!")
 
@@ -1,8 +1,13 @@
 """
 Módulo para coletar informações de hosts do Zabbix.
 """
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
 from pyzabbix import ZabbixAPI
-from typing import List, Dict
+from requests import Session
+from requests.adapters import HTTPAdapter
+from typing import Iterator, List, Dict, Tuple
+import atexit
 import logging
 import urllib3
 
@@ -10,8 +15,40 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 logger = logging.getLogger(__name__)
 
+# Hosts por requisição host.get e requisições simultâneas ao Zabbix
+HOSTS_PER_REQUEST = 500
+MAX_PARALLEL_REQUESTS = 4
+
+# Nome de grupos e templates (a API sempre retorna o campo name solicitado)
+_name = itemgetter('name')
+
+
+def _new_session() -> Session:
+    """Sessão HTTP do Zabbix: sem verificação SSL e com conexões suficientes para os lotes paralelos."""
+    session = Session()
+    session.verify = False
+    adapter = HTTPAdapter(pool_maxsize=MAX_PARALLEL_REQUESTS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _main_ip(interfaces) -> str:
+    """IP da interface principal, ou da primeira interface se a principal não tiver IP."""
+    if not interfaces:
+        return 'N/A'
+    ip = next((interface.get('ip') for interface in interfaces if interface.get('main') == '1'), None)
+    return ip or interfaces[0].get('ip') or 'N/A'
+
 
 class ZabbixCollector:
+    # Sessões autenticadas reaproveitadas entre coletas do mesmo processo,
+    # por (url, usuário): evita novo handshake TLS e login a cada job
+    _session_cache: Dict[Tuple[str, str], ZabbixAPI] = {}
+    # Versão da API por URL, detectada no primeiro login: os logins seguintes
+    # (sessão expirada, outro usuário) não repetem a chamada apiinfo.version
+    _version_cache: Dict[str, object] = {}
+    
     def __init__(self, url: str, username: str, password: str):
         self.url = url
         self.username = username
@@ -19,63 +56,59 @@ class ZabbixCollector:
         self.zapi = None
     
     def connect(self):
+        cached = self._session_cache.get((self.url, self.username))
+        if cached is not None and self._is_authenticated(cached):
+            self.zapi = cached
+            logger.info(f"Sessão reaproveitada no Zabbix: {self.url}")
+            return
+        
         try:
-            self.zapi = ZabbixAPI(self.url)
-            # Desabilita verificação SSL
-            self.zapi.session.verify = False
+            version = self._version_cache.get(self.url)
+            self.zapi = ZabbixAPI(self.url, session=_new_session(),
+                                  detect_version=version is None)
+            if version is not None:
+                # login() escolhe o parâmetro de usuário conforme a versão
+                self.zapi.version = version
             self.zapi.login(self.username, self.password)
+            self._version_cache[self.url] = self.zapi.version
             logger.info(f"Conectado ao Zabbix: {self.url}")
-            logger.info(f"Versão do Zabbix: {self.zapi.api_version()}")
+            logger.info(f"Versão do Zabbix: {self.zapi.version}")
         except Exception as e:
             logger.error(f"Erro ao conectar ao Zabbix: {e}")
             raise
+        
+        self._session_cache[(self.url, self.username)] = self.zapi
     
     def disconnect(self):
-        if self.zapi:
-            self.zapi.user.logout()
-            logger.info("Desconectado do Zabbix")
+        # A sessão continua em cache para a próxima coleta; o logout é feito
+        # em close_sessions(), ao final do processo
+        self.zapi = None
+    
+    @staticmethod
+    def _is_authenticated(zapi: ZabbixAPI) -> bool:
+        try:
+            zapi.user.checkAuthentication(sessionid=zapi.auth)
+            return True
+        except Exception:
+            return False
+    
+    @classmethod
+    def close_sessions(cls):
+        """Faz logout de todas as sessões em cache."""
+        while cls._session_cache:
+            (url, _), zapi = cls._session_cache.popitem()
+            try:
+                zapi.user.logout()
+                logger.info(f"Desconectado do Zabbix: {url}")
+            except Exception as e:
+                logger.warning(f"Erro ao desconectar do Zabbix: {e}")
     
     def get_all_hosts(self) -> List[Dict[str, str]]:
         if not self.zapi:
             raise Exception("Não conectado ao Zabbix. Execute connect() primeiro.")
         
         try:
-            hosts = self.zapi.host.get(
-                output=['hostid', 'host', 'name'],
-                selectInterfaces=['type', 'ip', 'main'],
-                selectGroups=['groupid', 'name'],
-                selectParentTemplates=['templateid', 'name'],
-                filter={'status': 0}
-            )
-            
-            hosts_data = []
-            
-            for host in hosts:
-                ip_address = None
-                if host.get('interfaces'):
-                    for interface in host['interfaces']:
-                        if interface.get('main') == '1':
-                            ip_address = interface.get('ip')
-                            break
-                    
-                    if not ip_address and host['interfaces']:
-                        ip_address = host['interfaces'][0].get('ip')
-                
-                host_groups = []
-                if host.get('groups'):
-                    host_groups = [group.get('name') for group in host['groups']]
-                
-                templates = []
-                if host.get('parentTemplates'):
-                    templates = [template.get('name') for template in host['parentTemplates']]
-                
-                hosts_data.append({
-                    'host_id': host['hostid'],
-                    'hostname': host.get('name') or host.get('host'),
-                    'ip_address': ip_address or 'N/A',
-                    'host_groups': ', '.join(host_groups) if host_groups else 'N/A',
-                    'templates': ', '.join(templates) if templates else 'N/A'
-                })
+            hosts_data = list(self.iter_hosts())
             
             logger.info(f"Coletados {len(hosts_data)} hosts do Zabbix")
             return hosts_data
@@ -84,6 +117,72 @@ class ZabbixCollector:
             logger.error(f"Erro ao coletar hosts: {e}")
             raise
     
+    def iter_hosts(self) -> Iterator[Dict[str, str]]:
+        """Gera os hosts ativos já no formato salvo no banco, um a um."""
+        # Combinações de grupos/templates se repetem entre milhares de hosts:
+        # hosts iguais passam a compartilhar a mesma string
+        pool = {}
+        for host in self._fetch_hosts():
+            host_groups = ', '.join(map(_name, host.get('groups') or ())) or 'N/A'
+            templates = ', '.join(map(_name, host.get('parentTemplates') or ())) or 'N/A'
+            yield {
+                'host_id': host['hostid'],
+                'hostname': host.get('name') or host.get('host'),
+                'ip_address': _main_ip(host.get('interfaces')),
+                'host_groups': pool.setdefault(host_groups, host_groups),
+                'templates': pool.setdefault(templates, templates)
+            }
+    
+    def _rpc(self, method: str, params: Dict):
+        """Chamada JSON-RPC direta na sessão autenticada (sem o proxy zapi.<objeto>.<método>)."""
+        return self.zapi.do_request(method, params)['result']
+    
+    def _fetch_hosts(self) -> Iterator[Dict]:
+        """Busca os hosts ativos em lotes de hostids consultados em paralelo,
+        entregando cada lote assim que ele chega (na ordem dos hostids)."""
+        host_ids = [host['hostid'] for host in self._rpc('host.get', {
+            'output': ['hostid'],
+            'filter': {'status': 0}
+        })]
+        shards = [host_ids[i:i + HOSTS_PER_REQUEST]
+                  for i in range(0, len(host_ids), HOSTS_PER_REQUEST)]
+        
+        if len(shards) <= 1:
+            if host_ids:
+                yield from self._fetch_host_details(host_ids)
+            return
+        
+        logger.info(f"Buscando {len(host_ids)} hosts em {len(shards)} lotes")
+        with ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_REQUESTS, len(shards))) as executor:
+            for shard in executor.map(self._fetch_host_details, shards):
+                yield from shard
+    
+    def _fetch_host_details(self, host_ids: List[str]) -> List[Dict]:
+        hosts = self._rpc('host.get', {
+            'hostids': host_ids,
+            # Apenas os campos usados em get_all_hosts
+            'output': ['hostid', 'host', 'name'],
+            'selectGroups': ['name'],
+            'selectParentTemplates': ['name'],
+            'filter': {'status': 0}
+        })
+        if not hosts:
+            return hosts
+        
+        # Interfaces em uma consulta separada, em vez de uma subconsulta por host
+        # via selectInterfaces, e associadas aos hosts pelo hostid
+        interfaces_by_host = {}
+        for interface in self._rpc('hostinterface.get', {
+            'hostids': [host['hostid'] for host in hosts],
+            'output': ['hostid', 'ip', 'main'],
+            'sortfield': 'interfaceid'
+        }):
+            interfaces_by_host.setdefault(interface['hostid'], []).append(interface)
+        
+        for host in hosts:
+            host['interfaces'] = interfaces_by_host.get(host['hostid'])
+        return hosts
+    
     def __enter__(self):
         """Context manager entry."""
         self.connect()
@@ -92,3 +191,6 @@ class ZabbixCollector:
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit."""
         self.disconnect()
+
+
+atexit.register(ZabbixCollector.close_sessions)